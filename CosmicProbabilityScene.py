@@ -2,6 +2,10 @@ from manim import *
 import numpy as np
 from manim.mobject.geometry.tips import ArrowSquareTip
 
+from batched_mobjects import (
+    ArrowField, Deform, ParticleBridge, ParticleCloud, ParticleSpiralIn, StreamlineField
+)
+
 class CosmicProbabilityScene(ThreeDScene):
     def construct(self):
         self.setup_initial_scene()
@@ -45,7 +49,8 @@ class CosmicProbabilityScene(ThreeDScene):
             particle_color=BLUE, 
             label=r"\alpha_0", 
             position=LEFT*3,
-            arm_tightness=0.4
+            arm_tightness=0.4,
+            seed=0
         )
         self.alpha1_dict = self.create_spiral_galaxy(
             spiral_arms=2, 
@@ -53,12 +58,13 @@ class CosmicProbabilityScene(ThreeDScene):
             label=r"\alpha_1", 
             position=RIGHT*3,
             arm_tightness=0.6,
-            rotation=PI/3
+            rotation=PI/3,
+            seed=1
         )
         
         self.play(
-            SpiralIn(self.alpha0_dict["particles"]),
-            SpiralIn(self.alpha1_dict["particles"]),
+            ParticleSpiralIn(self.alpha0_dict["particles"]),
+            ParticleSpiralIn(self.alpha1_dict["particles"]),
             run_time=4
         )
         self.wait()
@@ -79,25 +85,23 @@ class CosmicProbabilityScene(ThreeDScene):
         
     def create_spiral_galaxy(self, spiral_arms=2, particle_color=BLUE, 
                             label="", position=ORIGIN, arm_tightness=0.5,
-                            rotation=0):
+                            rotation=0, seed=0):
         galaxy_dict = {}
         galaxy = VGroup()
         n_particles = 1000  # Number of particles in the galaxy
-        
-        # Spiral parametric equations
-        particles = VGroup()
-        for i in range(n_particles):
-            theta = TAU * np.random.rand()
-            r = np.random.exponential(scale=2)
-            x = r * np.cos(theta + rotation) + arm_tightness * np.cos(spiral_arms * theta)
-            y = r * np.sin(theta + rotation) + arm_tightness * np.sin(spiral_arms * theta)
-            particle = Dot(
-                point=[x, y, 0],
-                color=particle_color,
-                radius=0.03 * np.random.normal(loc=1, scale=0.3),
-                fill_opacity=0.8 * np.random.rand()
-            )
-            particles.add(particle)
+        rng = np.random.default_rng(seed)  # Seeded, so every render draws the same galaxy
+        
+        # Spiral parametric equations, sampled for all particles at once
+        theta = TAU * rng.random(n_particles)
+        r = rng.exponential(scale=2, size=n_particles)
+        x = r * np.cos(theta + rotation) + arm_tightness * np.cos(spiral_arms * theta)
+        y = r * np.sin(theta + rotation) + arm_tightness * np.sin(spiral_arms * theta)
+        particles = ParticleCloud(
+            np.column_stack([x, y, np.zeros(n_particles)]),
+            radii=np.abs(0.03 * rng.normal(loc=1, scale=0.3, size=n_particles)),
+            opacities=0.8 * rng.random(n_particles),
+            colors=particle_color
+        )
         
         galaxy_dict["particles"] = particles
         galaxy.add(particles)
@@ -131,11 +135,11 @@ class CosmicProbabilityScene(ThreeDScene):
     def create_diffusion_bridge(self):
         # Scene 2: Blending Nebula
         t_tracker = ValueTracker(0)
-        bridge = always_redraw(lambda: self.generate_bridge(
+        bridge = self.generate_bridge(
             self.alpha0_dict["particles"],
-            self.alpha1_dict["particles"],
-            t_tracker.get_value()
-        ))
+            self.alpha1_dict["particles"]
+        )
+        bridge.add_updater(lambda m: m.set_time(t_tracker.get_value()))
         
         # Create time indicator with label
         time_indicator = NumberLine(
@@ -173,33 +177,22 @@ class CosmicProbabilityScene(ThreeDScene):
         )
         self.wait(2)
         
-    def generate_bridge(self, source, target, t):
-        bridge = VGroup()
-        n = len(source)
-        noise = 0.05  # Add perceptual randomness
-        
-        for s_dot, t_dot in zip(source, target):
-            # Add Perlin-like noise to movement
-            interp_point = interpolate(
-                s_dot.get_center() + noise * np.random.randn(3),
-                t_dot.get_center() + noise * np.random.randn(3),
-                smooth(t)
-            )
-            color = interpolate_color(
-                s_dot.get_color(), 
-                t_dot.get_color(), 
-                t + 0.1*np.sin(TAU*t)  # Add color oscillation
-            )
-            
-            particle = Dot(
-                interp_point,
-                color=color,
-                radius=s_dot.radius,
-                fill_opacity=s_dot.fill_opacity
-            )
-            bridge.add(particle)
-            
-        return bridge
+    def generate_bridge(self, source, target):
+        # Particle arrays are read once; set_time then updates the bridge in place every frame
+        s_positions, s_radii, s_opacities, s_colors = source.get_particles()
+        t_positions, _, _, t_colors = target.get_particles()
+        n = min(len(s_positions), len(t_positions))
+        return ParticleBridge(
+            s_positions[:n],
+            t_positions[:n],
+            source_colors=s_colors[:n],
+            target_colors=t_colors[:n],
+            radii=s_radii[:n],
+            opacities=s_opacities[:n],
+            noise=0.05,  # Add perceptual randomness
+            path_func=smooth,
+            color_func=lambda t: t + 0.1*np.sin(TAU*t)  # Add color oscillation
+        )
 
     def show_optimal_transport(self):
         # Scene 3: Optimal Transport River
@@ -220,36 +213,33 @@ class CosmicProbabilityScene(ThreeDScene):
         
     def create_velocity_field(self):
         # Create dynamic streamlines with varying density
-        streamlines = VGroup()
         n_lines = 50
         phase = ValueTracker(0)
+        scale, twist = self.streamline_params(range(n_lines))
         
-        for i in range(n_lines):
-            line = ParametricFunction(
-                lambda t: self.velocity_path(i, phase.get_value(), t),
-                t_range=[-PI, PI],
-                color=interpolate_color(WHITE, BLUE_E, i/n_lines)
-            )
-            line.add_updater(lambda m, dt: m.become(
-                ParametricFunction(
-                    lambda t: self.velocity_path(i, phase.get_value(), t),
-                    t_range=[-PI, PI],
-                    color=m.color
-                )
-            ))
-            streamlines.add(line)
+        # All lines and t-samples are evaluated in one call; the updater rewrites the points in place
+        streamlines = StreamlineField(
+            lambda phase_val, t: self.velocity_path(scale, twist, phase_val, t),
+            t_range=[-PI, PI],
+            colors=[interpolate_color(WHITE, BLUE_E, i/n_lines) for i in range(n_lines)]
+        )
+        streamlines.add_updater(lambda m: m.set_phase(phase.get_value()))
         
         self.add(streamlines)
         self.play(phase.animate.set_value(TAU), run_time=5, rate_func=linear)
         return streamlines
 
-    def velocity_path(self, seed, phase_val, t):
-        np.random.seed(seed)
-        return np.array([
-            3 * np.cos(t + 0.5 * phase_val) + 0.5 * np.sin(3*t),
-            2 * np.sin(t + 0.3 * phase_val) + 0.5 * np.cos(2*t),
-            0
-        ])
+    def streamline_params(self, seeds):
+        # Each line's size and twist come from its own seed, so every streamline is distinct
+        params = np.array([np.random.default_rng(seed).uniform([0.4, 0], [1.2, TAU]) for seed in seeds])
+        return params[:, :1], params[:, 1:]
+
+    def velocity_path(self, scale, twist, phase_val, t):
+        # scale, twist: (lines, 1) per-line parameters; t: (samples,) -> (lines, samples, 3)
+        t = np.asarray(t)[None, :]
+        x = scale * 3 * np.cos(t + 0.5 * phase_val) + 0.5 * np.sin(3*t + twist)
+        y = scale * 2 * np.sin(t + 0.3 * phase_val) + 0.5 * np.cos(2*t + twist)
+        return np.stack([x, y, np.zeros_like(x)], axis=-1)
         
     def create_energy_diagram(self):
         # Animated energy minimization display
@@ -318,42 +308,37 @@ class CosmicProbabilityScene(ThreeDScene):
                 run_time=0.5
             )
             self.play(
-                grid.animate.apply_function(lambda p: self.transport_map(p)),
-                alpha0.animate.apply_function(lambda p: self.transport_map(p)),
+                Deform(grid, self.transport_map),
+                Deform(alpha0, self.transport_map),
                 vectors.animate.set_opacity(1),
                 run_time=2
             )
         
         self.wait(2)
         
-    def transport_map(self, point):
-        # Custom transport deformation
-        x, y, z = point
-        return [
+    def transport_map(self, points):
+        # Custom transport deformation, vectorized: (N, 3) -> (N, 3), or a single point (3,)
+        points = np.asarray(points, dtype=float)
+        x, y, z = points[..., 0], points[..., 1], points[..., 2]
+        return np.stack([
             x + 0.5 * np.sin(x/2) * np.cos(y/3),
             y + 0.5 * np.cos(x/3) * np.sin(y/2),
             z
-        ]
+        ], axis=-1)
         
     def create_displacement_vectors(self, source, target):
-        vectors = VGroup()
-        sample_points = [m.get_center() for m in source[::50]]
-        
-        for point in sample_points:
-            start = point
-            end = self.transport_map(point)
-            length = np.linalg.norm(end - start)
-            color = interpolate_color(
-                GREEN, RED, length/3
-            )
-            vector = Arrow(
-                start, end,
-                color=color,
-                tip_length=0.2,
-                stroke_width=2
-            )
-            vectors.add(vector)
-            
+        # All arrows in one batched field, colored from GREEN to RED by displacement length
+        sample_points = source.get_positions()[::50]
+        vectors = ArrowField(
+            sample_points,
+            self.transport_map(sample_points),
+            color_range=(GREEN, RED),
+            max_magnitude=3,
+            tip_length=0.2,
+            buff=MED_SMALL_BUFF,
+            stroke_width=2
+        )
+        
         vectors.set_opacity(0)
         return vectors
 
@@ -362,7 +347,7 @@ class CosmicProbabilityScene(ThreeDScene):
         self.play(*[FadeOut(m) for m in self.mobjects])
         
         # Create combined visualization
-        bridge = self.generate_bridge(self.alpha0_dict["particles"], self.alpha1_dict["particles"], 0.5)
+        bridge = self.generate_bridge(self.alpha0_dict["particles"], self.alpha1_dict["particles"]).set_time(0.5)
         velocity_field = self.create_velocity_field()
         forge = self.demonstrate_wasserstein()
         
@@ -2,15 +2,7 @@ from manim import *
 from manim.mobject.three_d.three_dimensions import Surface
 import numpy as np
 
-class StarField(VGroup):
-    def __init__(self, is_3D=False, num_stars=200, **kwargs):
-        super().__init__(**kwargs)
-        for _ in range(num_stars):
-            x = np.random.uniform(-7, 7)
-            y = np.random.uniform(-4, 4)
-            z = np.random.uniform(-3, 3) if is_3D else 0
-            star = Dot(point=[x, y, z], color=WHITE, radius=0.02)
-            self.add(star)
+from batched_mobjects import StarField
 
 class QEDJourney(ThreeDScene):
     def construct(self):
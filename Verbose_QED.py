@@ -1,21 +1,7 @@
 from manim import *
 import numpy as np
 
-##############################################################################
-#  StarField utility
-##############################################################################
-class StarField(VGroup):
-    """
-    Creates a field of randomly placed small dots (stars) in either 2D or 3D.
-    """
-    def __init__(self, is_3D=False, num_stars=400, **kwargs):
-        super().__init__(**kwargs)
-        for _ in range(num_stars):
-            x = np.random.uniform(-7, 7)
-            y = np.random.uniform(-4, 4)
-            z = np.random.uniform(-3, 3) if is_3D else 0
-            star = Dot(point=[x, y, z], color=WHITE, radius=0.015)
-            self.add(star)
+from batched_mobjects import StarField
 
 ##############################################################################
 #  QEDJourney main scene
@@ -29,7 +15,7 @@ class QEDJourney(ThreeDScene):
         ############################################################################
         # 1. COSMIC STARFIELD FADE-IN
         ############################################################################
-        star_field = StarField(is_3D=True, num_stars=400)
+        star_field = StarField(is_3D=True, num_stars=400, radius=0.015)
         self.play(FadeIn(star_field, run_time=3))
         self.wait()
 
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app import (
+    create_application,
+    create_client,
+    create_executor,
+    concept_key,
+    create_math_visualization_prompt,
+    extract_manim_code,
+    generate_manim_content,
+    llm_cache,
+    match_template,
+    media_url,
+    run_coalesced,
+)
+from scheduler import QueueStatus
+from singleflight import FlightRestarted
+from streaming import LiveSegment
+from template_registry import template_code
+from executor import QUALITY_PRESETS, is_code_failure
+from metrics import error_class, record_job, registry
+from telemetry import Trace
+from video import hls_playlist_path, media_response
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class JobRequest(BaseModel):
+    """提交任务：concept 与 code 二选一"""
+    concept: Optional[str] = None
+    code: Optional[str] = None
+    # 不支持的质量预设直接返回 422，而不是在任务执行时才失败
+    quality: Literal[tuple(QUALITY_PRESETS)] = "high"
+
+
+class Job:
+    """一次可视化任务的状态"""
+
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.concept = request.concept
+        self.code = request.code
+        self.quality = request.quality
+        self.status = "queued"
+        self.detail = None          # 排队时为 {"stage", "position", "eta"}
+        self.content = None         # AI 完整响应
+        self.video_path = None
+        self.live_playlist = None   # 渲染中的实时预览播放列表
+        self.live_segments = 0
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+
+    def hls_url(self):
+        """长视频的 HLS 播放列表地址，没有分片时返回 None"""
+        if not self.video_path:
+            return None
+        playlist = hls_playlist_path(self.video_path)
+        if not playlist.exists():
+            return None
+        return media_url(playlist)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "detail": self.detail,
+            "concept": self.concept,
+            "code": self.code,
+            "content": self.content,
+            "artifact": f"/v1/jobs/{self.id}/artifact" if self.video_path else None,
+            "hls": self.hls_url(),
+            "live": media_url(self.live_playlist) if self.live_playlist else None,
+            "live_segments": self.live_segments,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class JobManager:
+    """异步任务管理
+
+    任务在线程池中执行，复用 app 中的调度器、缓存和 ManimExecutor；
+    状态变化通过事件循环推送给订阅者。已结束的任务保留 job_ttl 秒，
+    且最多保留 max_finished 个，提交新任务时清理。
+    """
+
+    def __init__(self, max_workers=None, job_ttl=None, max_finished=None):
+        if max_workers is None:
+            max_workers = int(os.getenv("API_MAX_JOBS", "64"))
+        if job_ttl is None:
+            job_ttl = float(os.getenv("API_JOB_TTL", "3600"))
+        if max_finished is None:
+            max_finished = int(os.getenv("API_MAX_FINISHED_JOBS", "1000"))
+        self.job_ttl = job_ttl
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.subscribers = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-job")
+        self.loop = None
+        self._tasks = set()
+
+    async def submit(self, request):
+        self.loop = asyncio.get_running_loop()
+        self._evict()
+        job = Job(request)
+        self.jobs[job.id] = job
+        task = asyncio.ensure_future(self.loop.run_in_executor(self.executor, self._run, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def _evict(self):
+        """删除过期的已结束任务；数量仍超过上限时从最早结束的开始删除"""
+        now = time.time()
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in TERMINAL_STATUSES),
+            key=lambda job: job.updated
+        )
+        excess = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i < excess or now - job.updated > self.job_ttl:
+                del self.jobs[job.id]
+
+    def _update(self, job, **fields):
+        """在工作线程中更新任务状态，并通知订阅者"""
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated = time.time()
+        self.loop.call_soon_threadsafe(self._publish, job.id, job.to_dict())
+
+    def _publish(self, job_id, snapshot):
+        for queue in self.subscribers.get(job_id, ()):
+            queue.put_nowait(snapshot)
+
+    def _run_stage(self, job, stage_name, status, fn, key):
+        """在调度器中执行一个阶段，排队期间更新位置和预计等待时间，渲染期间推送实时预览分片
+
+        与进行中的相同任务合并时，直接进入该阶段的状态并共享其结果。
+        """
+        def start_and_run():
+            self._update(job, status=status, detail=None)
+            return fn()
+
+        def on_join():
+            self._update(job, status=status, detail=None)
+
+        stage_runner = run_coalesced(stage_name, key, start_and_run, on_join)
+        try:
+            while True:
+                update = next(stage_runner)
+                if isinstance(update, QueueStatus):
+                    self._update(job, status="queued", detail={
+                        "stage": stage_name, "position": update.position, "eta": update.eta
+                    })
+                elif isinstance(update, LiveSegment):
+                    self._update(job, live_playlist=update.playlist, live_segments=update.index + 1)
+                elif isinstance(update, FlightRestarted):
+                    # 合并的任务中断后重新执行，之前的实时预览作废
+                    self._update(job, live_playlist=None, live_segments=0)
+        except StopIteration as stop:
+            return stop.value
+
+    def _run(self, job):
+        trace = Trace(job.id)
+        prompt = None
+        try:
+            code = job.code
+            template = match_template(job.concept, trace) if code is None else None
+            if template is not None:
+                # 模板快速路径：不调用 AI
+                code = template_code(template)
+                self._update(job, code=code)
+            elif code is None:
+                with trace.span("prompt_build"):
+                    prompt = create_math_visualization_prompt(job.concept)
+                trace.dump("prompt.txt", prompt)
+                content, _ = self._run_stage(
+                    job, "llm", "generating", lambda: generate_manim_content(prompt, trace),
+                    concept_key(job.concept)
+                )
+                with trace.span("extract"):
+                    code = extract_manim_code(content)
+                self._update(job, content=content, code=code)
+
+            executor = create_executor()
+            executor.set_quality(job.quality)
+            # 已知会失败的代码不进入渲染队列
+            executor.check_known_failure(code, trace)
+            video_path = self._run_stage(
+                job, "render", "rendering", lambda: executor.execute_iter(code, trace),
+                executor.cache_key(code)
+            )
+            trace.mark("total")
+            record_job()
+            self._update(job, status="succeeded", video_path=video_path)
+        except Exception as e:
+            trace.event("failed", level=logging.ERROR, error=error_class(e))
+            record_job(e)
+            if prompt is not None and is_code_failure(e):
+                # 不再返回这份无法渲染的代码，下次请求重新生成
+                llm_cache.delete(prompt)
+            self._update(job, status="failed", error=str(e))
+
+    async def events(self, job):
+        """以 Server-Sent Events 推送任务状态，直到任务结束"""
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(job.id, set()).add(queue)
+        try:
+            snapshot = job.to_dict()
+            while True:
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+                if snapshot["status"] in TERMINAL_STATUSES:
+                    break
+                snapshot = await queue.get()
+        finally:
+            self.subscribers[job.id].discard(queue)
+            if not self.subscribers[job.id]:
+                del self.subscribers[job.id]
+
+
+jobs = JobManager()
+api = FastAPI(title="Math-To-Manim API")
+
+
+def get_job(job_id):
+    job = jobs.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@api.post("/v1/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """提交概念或代码，返回任务 ID"""
+    if bool(request.concept) == bool(request.code):
+        raise HTTPException(status_code=422, detail="concept 与 code 必须且只能提供一个")
+    job = await jobs.submit(request)
+    return {"job_id": job.id, "status": job.status}
+
+
+@api.get("/v1/jobs/{job_id}")
+async def job_status(job_id: str):
+    """查询任务状态"""
+    return get_job(job_id).to_dict()
+
+
+@api.get("/v1/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """订阅任务状态（SSE）"""
+    job = get_job(job_id)
+    return StreamingResponse(jobs.events(job), media_type="text/event-stream")
+
+
+@api.get("/v1/jobs/{job_id}/artifact")
+async def job_artifact(job_id: str, request: Request):
+    """下载生成的视频（支持 Range 请求）"""
+    job = get_job(job_id)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"任务尚未完成（当前状态：{job.status}）")
+    return media_response(job.video_path, request.headers.get("range"))
+
+
+@api.get("/metrics")
+async def metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# API 路由注册在前，/media 与其余路径由 app.create_application 注册并交给 Gradio 界面
+application = create_application(api)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # 启动时尽早发现缺失的密钥
+    create_client()
+    uvicorn.run(
+        application,
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "7860"))
+    )
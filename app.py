@@ -1,177 +1,75 @@
 import os
 import re
-import tempfile
-import subprocess
+import hashlib
+import logging
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 import gradio as gr
-from openai import OpenAI
-import numpy as np
-from manim import *
+from llm_router import LLMRouter
+from rate_limit import RateLimiter, CircuitOpenError
+from cache import LLMCache, normalize_concept
+from scheduler import PipelineScheduler, QueueStatus, SessionLimitExceeded
+from video import HLS_PLAYER_HEAD, MEDIA_PREFIX, hls_playlist_path, media_router, video_html
+from streaming import LiveSegment
+from telemetry import Trace, configure_logging
+from metrics import (
+    error_class, job_queue_collector, registry, record_cache, record_coalesced, record_job,
+    router_collector, scheduler_collector
+)
+from executor import OUTPUT_DIR, ManimExecutor, is_code_failure
+from job_queue import SQLiteJobQueue
+from worker import RemoteExecutor
+from singleflight import FlightRestarted, SingleFlight
+from template_registry import classify, template_code
 
 # Load environment variables from .env file
 load_dotenv()
+configure_logging()
+
+def create_client():
+    """创建 DeepSeek 客户端（首次调用 LLM 时才导入 openai 并校验密钥）"""
+    if not os.getenv("DEEPSEEK_API_KEY"):
+        raise ValueError("DEEPSEEK_API_KEY environment variable is not set. Please check your .env file.")
+    from openai import OpenAI
+    # Initialize OpenAI client with DeepSeek base URL
+    return OpenAI(
+        api_key=os.getenv("DEEPSEEK_API_KEY"),
+        base_url="https://api.deepseek.com"
+    )
+
+# 所有 LLM 调用共享同一个限流器和熔断器
+limiter = RateLimiter()
 
-# Initialize OpenAI client with DeepSeek base URL
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com"
+# 模型路由：reasoner 超出延迟预算时对冲到快速模型；客户端在第一次请求时创建
+router = LLMRouter(client_factory=create_client, limiter=limiter)
+
+# LLM 响应缓存：熔断期间可返回过期条目
+llm_cache = LLMCache()
+
+# 多节点渲染：设置 RENDER_QUEUE 后 Web 进程只负责入队，由各节点上的 worker.py 渲染
+render_queue = SQLiteJobQueue() if os.getenv("RENDER_QUEUE") else None
+
+# 流水线调度：LLM 与渲染阶段分别限流，并限制每个会话的未完成任务数；
+# 使用渲染队列时本地只是等待结果，默认允许更多任务同时入队
+scheduler = PipelineScheduler(
+    render_concurrency=int(os.getenv("RENDER_CONCURRENCY", "64")) if render_queue else None
 )
 
-# Verify API key is present
-if not os.getenv("DEEPSEEK_API_KEY"):
-    raise ValueError("DEEPSEEK_API_KEY environment variable is not set. Please check your .env file.")
+# /metrics 抓取时采集队列深度、工作槽位占用和各路由的 LLM 延迟
+registry.register(scheduler_collector(scheduler))
+registry.register(router_collector(router))
+if render_queue is not None:
+    registry.register(job_queue_collector(render_queue))
 
-class ManimExecutor:
-    """Manim 代码执行器"""
-    def __init__(self):
-        self.temp_dir = Path(tempfile.gettempdir()) / "math_to_manim"
-        self.output_dir = Path("static/animations")
-        
-        # 创建必要的目录
-        self.temp_dir.mkdir(parents=True, exist_ok=True)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 设置默认渲染配置
-        self.render_config = {
-            "pixel_width": 1920,      # 视频宽度
-            "pixel_height": 1080,     # 视频高度
-            "frame_rate": 60,         # 帧率
-            "background_color": "#1C1C1C",  # 深灰色背景
-        }
-    
-    def extract_scene_name(self, code):
-        """从代码中提取场景类名"""
-        scene_match = re.search(r'class\s+(\w+)\s*\(\s*Scene\s*\)', code)
-        if scene_match:
-            return scene_match.group(1)
-        return "MathScene"
-    
-    def prepare_code(self, code):
-        """准备代码，添加必要的配置"""
-        # 检查是否需要使用 ThreeDScene
-        is_3d = "frame = self.camera.frame" in code
-        
-        config_code = f"""
-# 设置渲染配置
-config.pixel_width = {self.render_config['pixel_width']}
-config.pixel_height = {self.render_config['pixel_height']}
-config.frame_rate = {self.render_config['frame_rate']}
-config.background_color = "{self.render_config['background_color']}"
+# 相同概念的 LLM 请求、相同代码和配置的渲染在进行中时只执行一次
+flights = SingleFlight()
 
-"""
-        # 如果代码中使用了 camera.frame，需要使用 ThreeDScene
-        if is_3d:
-            code = code.replace("(Scene):", "(ThreeDScene):")
-            print("检测到3D场景需求，已将Scene替换为ThreeDScene")
-        
-        # 在 imports 后添加配置
-        if "from manim import *" in code:
-            code = code.replace(
-                "from manim import *",
-                "from manim import *\n" + config_code
-            )
-        else:
-            code = "from manim import *\n" + config_code + code
-        
-        return code
-    
-    def execute(self, code):
-        """执行 Manim 代码并返回生成的视频路径"""
-        try:
-            print("\n7.1 正在提取场景名...")
-            scene_name = self.extract_scene_name(code)
-            print(f"场景名: {scene_name}")
-            
-            print("\n7.2 正在准备代码...")
-            prepared_code = self.prepare_code(code)
-            print("代码准备完成，包含渲染配置")
-            
-            print("\n7.3 正在创建临时Python文件...")
-            temp_file = self.temp_dir / "temp_scene.py"
-            temp_file.write_text(prepared_code, encoding='utf-8')
-            print(f"临时文件创建成功: {temp_file}")
-            print(f"文件内容:\n{'-'*50}\n{prepared_code}\n{'-'*50}")
-            
-            print("\n7.4 正在构建Manim命令...")
-            # 在Windows上使用gbk编码
-            if os.name == 'nt':
-                cmd = f"chcp 65001 && manim -pqh --fps {self.render_config['frame_rate']} {temp_file} {scene_name}"
-            else:
-                cmd = f"manim -pqh --fps {self.render_config['frame_rate']} {temp_file} {scene_name}"
-            print(f"执行命令: {cmd}")
-            
-            print("\n7.5 开始执行Manim命令...")
-            # 在Windows上设置encoding='gbk'
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding='gbk' if os.name == 'nt' else 'utf-8'
-            )
-            
-            print("\n7.6 Manim命令执行输出:")
-            print("-" * 50)
-            print("标准输出:")
-            print(result.stdout)
-            if result.stderr:
-                print("\n错误输出:")
-                print(result.stderr)
-            print("-" * 50)
-            
-            print("\n7.7 正在查找生成的视频文件...")
-            video_files = list(self.temp_dir.glob("*.mp4"))
-            if not video_files:
-                raise Exception("未找到生成的视频文件")
-            print(f"找到视频文件: {video_files[0]}")
-            
-            print("\n7.8 正在移动视频到输出目录...")
-            video_file = video_files[0]
-            output_file = self.output_dir / f"{scene_name}_{video_file.name}"
-            video_file.rename(output_file)
-            print(f"视频已移动到: {output_file}")
-            
-            return str(output_file)
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Manim 执行错误:\n{e.stderr if hasattr(e, 'stderr') else str(e)}"
-            print(f"\n❌ {error_msg}")
-            raise Exception(error_msg)
-        except Exception as e:
-            error_msg = f"动画生成失败: {str(e)}"
-            print(f"\n❌ {error_msg}")
-            raise Exception(error_msg)
-
-    def set_quality(self, quality_preset="high"):
-        """设置渲染质量预设"""
-        presets = {
-            "low": {
-                "pixel_width": 854,
-                "pixel_height": 480,
-                "frame_rate": 30,
-            },
-            "medium": {
-                "pixel_width": 1280,
-                "pixel_height": 720,
-                "frame_rate": 30,
-            },
-            "high": {
-                "pixel_width": 1920,
-                "pixel_height": 1080,
-                "frame_rate": 60,
-            },
-            "ultra": {
-                "pixel_width": 3840,
-                "pixel_height": 2160,
-                "frame_rate": 60,
-            }
-        }
-        
-        if quality_preset in presets:
-            self.render_config.update(presets[quality_preset])
-        else:
-            raise ValueError(f"不支持的质量预设: {quality_preset}")
+def create_executor():
+    """本地渲染或交给渲染队列"""
+    if render_queue is not None:
+        return RemoteExecutor(render_queue)
+    return ManimExecutor()
 
 def extract_manim_code(content):
     """从 AI 响应中提取 Manim 代码"""
@@ -196,11 +94,8 @@ def create_storyboard(concept):
 """
     
     # 调用 AI 生成分镜脚本
-    response = client.chat.completions.create(
-        model="deepseek-reasoner",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content
+    content, _ = router.complete([{"role": "user", "content": prompt}])
+    return content
 
 def create_animation_code(storyboard):
     """根据分镜脚本生成 Manim 代码"""
@@ -398,69 +293,221 @@ class TrigFunction(Scene):
 """
     return prompt
 
-def process_math_visualization(message, history):
-    """处理数学可视化请求"""
+# 提示词模板的版本：模板改动后新请求不会合并到按旧模板生成的任务上
+PROMPT_VERSION = hashlib.sha256(create_math_visualization_prompt("").encode("utf-8")).hexdigest()[:12]
+
+def concept_key(concept):
+    """LLM 阶段的合并键：规范化后的概念 + 提示词版本"""
+    return f"{PROMPT_VERSION}:{normalize_concept(concept)}"
+
+def generate_manim_content(prompt, trace=None):
+    """调用 AI 生成包含 Manim 代码的响应，优先读取缓存，返回 (内容, 路由)"""
+    trace = trace or Trace()
+    content = llm_cache.get(prompt)
+    record_cache("llm", content is not None)
+    if content is not None:
+        trace.event("llm_cache_hit")
+        return content, "cache"
+
+    first_token = threading.Lock()
+
+    def on_first_token(route):
+        # 对冲时两个路由都会回调，只记录最早的一次
+        if first_token.acquire(blocking=False):
+            trace.mark("llm_first_token", route=route)
+
     try:
-        # 生成动画代码
-        print("\n1. 开始处理可视化请求...")
-        print(f"用户输入: {message}")
+        with trace.span("llm_done") as fields:
+            content, route = router.complete(
+                [{"role": "user", "content": prompt}],
+                validate=extract_manim_code,
+                on_first_token=on_first_token
+            )
+            fields["route"] = route
+            fields["chars"] = len(content)
+        trace.dump("response.md", content)
+        llm_cache.set(prompt, content)
+        return content, route
+    except CircuitOpenError:
+        # API 降级期间只返回缓存结果
+        content = llm_cache.get(prompt, allow_stale=True)
+        if content is None:
+            raise
+        trace.event("llm_stale_cache_hit", level=logging.WARNING)
+        return content, "cache (降级)"
+
+def media_url(path):
+    """输出文件在 /media 路由下的地址（见 create_application）"""
+    return MEDIA_PREFIX + Path(path).resolve().relative_to(OUTPUT_DIR.resolve()).as_posix()
+
+STAGE_LABELS = {"llm": "AI 生成代码", "render": "动画渲染"}
+
+def format_queue_status(stage_name, position, eta):
+    """排队状态提示"""
+    return f"⏳ 正在排队等待{STAGE_LABELS[stage_name]}：前面还有 {position} 个任务，预计等待约 {int(eta)} 秒"
+
+def run_coalesced(stage_name, key, fn, on_join=None):
+    """在调度器中执行一个阶段，key 相同的并发请求合并为一次执行
+
+    合并的请求不占用阶段槽位，共享领头请求的排队状态、进度事件和结果。
+    """
+    def join():
+        record_coalesced(stage_name)
+        if on_join is not None:
+            on_join()
+    return flights.run((stage_name, key), lambda: scheduler.run_stage(stage_name, fn), join)
+
+def run_stage_with_status(stage_name, fn, key, trace=None, on_restart=None):
+    """在调度器中执行一个阶段，排队期间产出状态提示，结束后返回 fn 的结果
+
+    fn 返回生成器时，其产出的进度事件（如 LiveSegment）原样转发。合并的任务中途
+    中断而重新执行时调用 on_restart()，之前转发的进度作废。
+    """
+    def on_join():
+        if trace is not None:
+            trace.event("coalesced", stage=stage_name)
+    stage_runner = run_coalesced(stage_name, key, fn, on_join)
+    try:
+        while True:
+            update = next(stage_runner)
+            if isinstance(update, QueueStatus):
+                yield format_queue_status(stage_name, update.position, update.eta)
+            elif isinstance(update, FlightRestarted):
+                if trace is not None:
+                    trace.event("coalesced_restart", stage=stage_name)
+                if on_restart is not None:
+                    on_restart()
+                yield f"🔁 合并的相同任务已中断，正在重新{STAGE_LABELS[stage_name]}..."
+            else:
+                yield update
+    except StopIteration as stop:
+        return stop.value
+
+def render_with_preview(executor, manim_code, trace=None):
+    """渲染动画，第一段动画完成后即在聊天中展示实时预览，结束后返回视频路径"""
+    # 已知会失败的代码不进入渲染队列
+    executor.check_known_failure(manim_code, trace)
+    preview_shown = False
+
+    def on_restart():
+        # 重新执行的渲染使用新的实时播放列表，需要重新推送播放器
+        nonlocal preview_shown
+        preview_shown = False
+
+    runner = run_stage_with_status(
+        "render", lambda: executor.execute_iter(manim_code, trace), executor.cache_key(manim_code), trace,
+        on_restart
+    )
+    try:
+        while True:
+            update = next(runner)
+            if isinstance(update, LiveSegment):
+                # 播放器只推送一次，之后由浏览器轮询 EVENT 播放列表获取新分片
+                if not preview_shown:
+                    preview_shown = True
+                    yield gr.HTML(video_html(
+                        hls_url=media_url(update.playlist),
+                        caption="🎬 正在渲染，可先观看已完成的部分："
+                    ))
+            else:
+                yield update
+    except StopIteration as stop:
+        return stop.value
+
+def match_template(concept, trace=None):
+    """模板快速路径：概念足够确定地匹配某个内置模板时返回 TemplateMatch，否则返回 None"""
+    if os.getenv("TEMPLATE_FAST_PATH", "1") == "0":
+        return None
+    trace = trace or Trace()
+    with trace.span("classify") as fields:
+        match = classify(concept)
+        if match is not None:
+            fields.update(template=match.template, confidence=match.confidence)
+    if match is None or match.confidence < float(os.getenv("TEMPLATE_MIN_CONFIDENCE", "0.75")):
+        return None
+    return match
+
+def video_message(video_path, caption):
+    """最终结果：视频播放器（长视频附带 HLS）"""
+    hls_path = hls_playlist_path(video_path)
+    return gr.HTML(video_html(
+        media_url(video_path),
+        hls_url=media_url(hls_path) if hls_path.exists() else None,
+        caption=caption
+    ))
+
+def _process_math_visualization(message):
+    """可视化流水线：生成代码 -> 渲染动画，逐步产出状态信息和最终结果"""
+    trace = Trace()
+    trace.event("request", chars=len(message))
+    trace.dump("input.txt", message)
+    try:
+        # 识别出的常见概念直接使用内置模板渲染，不调用 AI
+        template = match_template(message, trace)
+        if template is not None:
+            yield "🧩 已匹配内置动画模板，正在渲染..."
+            video_path = yield from render_with_preview(create_executor(), template_code(template), trace)
+            trace.mark("total", route=f"template:{template.template}")
+            record_job()
+            yield video_message(
+                video_path,
+                f"使用内置模板“{template.template}”生成（匹配置信度 {template.confidence:.0%}，未调用 AI）："
+            )
+            return
         
-        print("\n2. 正在生成AI提示...")
-        prompt = create_math_visualization_prompt(message)
-        print("生成的提示内容:")
-        print(prompt)
+        # 生成动画代码
+        with trace.span("prompt_build"):
+            prompt = create_math_visualization_prompt(message)
+        trace.dump("prompt.txt", prompt)
         
-        print("\n3. 正在调用AI生成代码...")
-        response = client.chat.completions.create(
-            model="deepseek-reasoner",
-            messages=[{"role": "user", "content": prompt}]
+        yield "🤖 正在生成动画代码..."
+        content, route = yield from run_stage_with_status(
+            "llm", lambda: generate_manim_content(prompt, trace), concept_key(message), trace
         )
-        content = response.choices[0].message.content
-        print("\n4. AI响应内容:")
-        print("-" * 50)
-        print(content)
-        print("-" * 50)
         
         # 提取并执行代码
         try:
-            print("\n5. 正在提取Manim代码...")
-            manim_code = extract_manim_code(content)
-            print("\n6. 提取的代码:")
-            print("-" * 50)
-            print(manim_code)
-            print("-" * 50)
+            with trace.span("extract"):
+                manim_code = extract_manim_code(content)
+            trace.dump("code.py", manim_code)
             
-            print("\n7. 正在执行Manim代码...")
-            executor = ManimExecutor()
-            video_path = executor.execute(manim_code)
-            print(f"\n8. 视频生成成功！保存在: {video_path}")
+            yield "🎬 代码已生成，正在渲染动画..."
+            executor = create_executor()
+            video_path = yield from render_with_preview(executor, manim_code, trace)
             
             # 提取教学分析
-            print("\n9. 正在提取教学分析...")
             analysis_match = re.search(r'教学分析：(.*?)动画剧本：', content, re.DOTALL)
             teaching_analysis = analysis_match.group(1).strip() if analysis_match else "未找到教学分析"
-            print("\n10. 提取的教学分析:")
-            print("-" * 50)
-            print(teaching_analysis)
-            print("-" * 50)
+            trace.mark("total", route=route)
+            record_job()
             
-            return f"""教学分析：
-
-{teaching_analysis}
-
-动画演示：[video]{video_path}[/video]"""
+            yield video_message(video_path, f"教学分析：\n\n{teaching_analysis}\n\n动画演示：")
         
         except Exception as code_error:
-            print(f"\n❌ 代码执行失败: {str(code_error)}")
-            return f"""生成结果：
+            trace.event("code_failed", level=logging.ERROR, error=error_class(code_error))
+            record_job(code_error)
+            if is_code_failure(code_error):
+                # 不再返回这份无法渲染的代码，下次请求重新生成
+                llm_cache.delete(prompt)
+            yield f"""生成结果：
 
 {content}
 
 动画生成失败：{str(code_error)}"""
             
     except Exception as e:
-        print(f"\n❌ 处理失败: {str(e)}")
-        return f"错误: {str(e)}"
+        trace.event("failed", level=logging.ERROR, error=error_class(e))
+        record_job(e)
+        yield f"错误: {str(e)}"
+
+def process_math_visualization(message, history, request: gr.Request = None):
+    """处理数学可视化请求（Gradio 入口），同一会话同时只能有有限个任务"""
+    session_id = request.session_hash if request is not None else "default"
+    try:
+        with scheduler.session(session_id):
+            yield from _process_math_visualization(message)
+    except SessionLimitExceeded as e:
+        yield f"错误: {str(e)}"
 
 # 更新界面描述
 iface = gr.ChatInterface(
@@ -479,87 +526,40 @@ iface = gr.ChatInterface(
     
     🎯 无需输入复杂的公式或详细说明，保持简单即可！
     """,
-    theme="soft"
+    theme="soft",
+    head=HLS_PLAYER_HEAD
 )
 
-if __name__ == "__main__":
-    iface.launch()
+# 显式启用队列：真正的限流由调度器按阶段完成（排队时显示位置），合并到进行中任务的
+# 重复请求只是等待结果。界面并发远高于各阶段并发之和，这些等待中的请求不会占满 Gradio 的
+# 工作槽位而让其他用户卡在 Gradio 队列里；超过队列上限的请求直接提示繁忙
+ui_concurrency = int(os.getenv("UI_CONCURRENCY", "0")) or max(64, 4 * scheduler.total_concurrency)
+# 同步生成器在 Gradio 的线程池中运行，线程数需与并发上限一致（默认只有 40）
+iface.max_threads = ui_concurrency
+iface.queue(
+    default_concurrency_limit=ui_concurrency,
+    max_size=int(os.getenv("QUEUE_MAX_SIZE", "50"))
+)
 
-class FractalTree(Scene):
-    def construct(self):
-        # 初始化参数
-        start_length = 3  # 初始树干长度
-        angle = 30*DEGREES  # 分叉角度
-        length_ratio = 0.7  # 长度比例
-        iterations = 4  # 迭代次数
-
-        # 创建基础树干
-        trunk = Line(ORIGIN, UP*start_length, color=BLUE)
-        title = Text("分形树 - 第0次迭代", font="SimSun").to_edge(UP)
-        self.play(Create(trunk), Write(title))
-        self.wait(1)
-
-        # 存储所有分支
-        branches = VGroup(trunk)
-        all_new_branches = VGroup()
-
-        # 递归生成分形树
-        for n in range(1, iterations+1):
-            new_branches = VGroup()
-            
-            # 遍历当前层级的分支
-            for branch in branches:
-                # 获取当前分支的向量
-                branch_vector = branch.get_vector()
-                end_point = branch.get_end()
-                
-                # 创建左分支
-                left_branch = Line(
-                    start=end_point,
-                    end=end_point + rotate_vector(branch_vector*length_ratio, angle),
-                    color=GREEN
-                )
-                
-                # 创建右分支
-                right_branch = Line(
-                    start=end_point,
-                    end=end_point + rotate_vector(branch_vector*length_ratio, -angle),
-                    color=GREEN
-                )
-                
-                # 添加新分支
-                new_branches.add(left_branch, right_branch)
-            
-            # 更新标题
-            new_title = Text(f"分形树 - 第{n}次迭代", font="SimSun").to_edge(UP)
-            
-            # 创建动画
-            self.play(
-                Transform(title, new_title),
-                LaggedStart(*[Create(b) for b in new_branches], lag_ratio=0.1),
-                run_time=2
-            )
-            
-            # 更新分支集合
-            all_new_branches.add(new_branches)
-            branches = new_branches
-            self.wait(0.5)
+def create_application(server=None):
+    """把 Gradio 界面挂载到 FastAPI 应用上
 
-        # 添加公式
-        formula = MathTex(
-            r"L_{n} = ", r"r", r" \times L_{n-1}",
-            r"\\", r"\theta = 30^\circ"
-        ).to_edge(DOWN)
-        
-        self.play(Write(formula))
-        self.wait(1)
-
-        # 添加参数说明
-        param_text = Text(
-            "r: 长度比例\nθ: 分叉角度",
-            font="SimSun",
-            color=YELLOW
-        ).scale(0.8).next_to(formula, RIGHT)
-        
-        self.play(Write(param_text))
-        self.wait(2) 
\ No newline at end of file
+    聊天中的视频和 HLS 播放列表通过 /media 路由提供（Range 请求、faststart 后的边下边播、
+    直播播放列表 no-cache），而不是 Gradio 的通用文件路由。server 上已注册的路由优先。
+    """
+    from fastapi import FastAPI
+
+    server = server or FastAPI()
+    server.include_router(media_router(OUTPUT_DIR))
+    return gr.mount_gradio_app(server, iface, path="/")
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # 启动时尽早发现缺失的密钥
+    create_client()
+    uvicorn.run(
+        create_application(),
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "7860"))
+    )
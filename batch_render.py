@@ -0,0 +1,208 @@
+import importlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from executor import BACKGROUND_COLOR, OUTPUT_DIR, QUALITY_PRESETS
+from template_registry import canonical_params, template_cache_key
+from telemetry import configure_logging, logger
+from video import faststart
+
+# 一个渲染项：模板名、模板参数和质量预设
+RenderItem = namedtuple("RenderItem", "template params quality", defaults=(None, "high"))
+
+# 渲染结果：对应的渲染项、视频路径（失败时为 None）和错误信息
+BatchResult = namedtuple("BatchResult", "item video error")
+
+
+def _warm_up():
+    """工作进程启动时预先导入 Manim 和模板，后续任务无需重复付出导入开销"""
+    for module in ("manim", "text_to_manim"):
+        importlib.import_module(module)
+
+
+def _render_template(template, params, quality, output_file, work_dir):
+    """在工作进程中渲染一个模板场景
+
+    每个任务使用独立的临时 config（tempconfig 结束后恢复）和独立的 media 目录，
+    完成后把视频移动到 output_file。
+    """
+    from manim import tempconfig
+    from text_to_manim import MLAnimationGenerator
+
+    output_file = Path(output_file)
+    media_dir = Path(tempfile.mkdtemp(prefix="batch_", dir=work_dir))
+    try:
+        scene_class = MLAnimationGenerator().build_scene(template, params)
+        with tempconfig({
+            **QUALITY_PRESETS[quality],
+            "background_color": BACKGROUND_COLOR,
+            "media_dir": str(media_dir),
+            "output_file": output_file.stem,
+            "preview": False,
+            "write_to_movie": True,
+            "progress_bar": "none",
+            "verbosity": "WARNING",
+        }):
+            scene = scene_class()
+            scene.render()
+            movie = Path(scene.renderer.file_writer.movie_file_path)
+        # 先写临时文件再改名，其他进程不会读到写了一半的视频
+        tmp = output_file.with_name(f".{output_file.stem}.{os.getpid()}.mp4")
+        shutil.move(str(movie), tmp)
+        try:
+            faststart(tmp)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning("faststart 失败 %s: %s", output_file.name, e)
+        os.replace(tmp, output_file)
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+    return str(output_file)
+
+
+class BatchRenderer:
+    """在常驻进程池中并行渲染模板场景
+
+    进程池在第一次渲染时创建并一直保留（进程已导入 Manim，模板类在进程内复用），
+    直到 close()。输出文件名由模板名、规范化参数和质量决定：已存在的结果直接返回，
+    同一批中相同的渲染项只渲染一次。
+    """
+
+    def __init__(self, max_workers=None, output_dir=None):
+        if max_workers is None:
+            max_workers = int(os.getenv("BATCH_RENDER_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.output_dir = Path(output_dir or OUTPUT_DIR)
+        self.work_dir = Path(tempfile.gettempdir()) / "math_to_manim" / "batch"
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn：不继承 Web 进程的线程和 Manim 全局状态
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+            return self._pool
+
+    def _reset_pool(self, pool):
+        """工作进程崩溃后进程池不可再用，下次渲染时重新创建"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def output_path(self, item):
+        scene_name = "".join(part.title() for part in item.template.split("_"))
+        key = template_cache_key(item.template, item.params)
+        return self.output_dir / f"{scene_name}_{key.rsplit('-', 1)[1]}_{item.quality}.mp4"
+
+    def render(self, items):
+        """渲染一批 (template, params, quality) 项，返回顺序与 items 一致的 BatchResult 列表
+
+        单项失败不影响其他项，错误信息记录在对应结果的 error 中。
+        """
+        items = [self._normalize(item) for item in items]
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        pool = self._get_pool()
+        futures = {}
+        for item in items:
+            output_file = self.output_path(item)
+            if output_file in futures or output_file.exists():
+                continue
+            futures[output_file] = pool.submit(
+                _render_template, item.template, item.params, item.quality,
+                str(output_file), str(self.work_dir)
+            )
+        if futures:
+            logger.info("批量渲染：%d 项，实际渲染 %d 项，进程数 %d", len(items), len(futures), self.max_workers)
+
+        results = []
+        for item in items:
+            output_file = self.output_path(item)
+            future = futures.get(output_file)
+            if future is None:
+                results.append(BatchResult(item, str(output_file), None))
+                continue
+            try:
+                results.append(BatchResult(item, future.result(), None))
+            except BrokenProcessPool as e:
+                self._reset_pool(pool)
+                results.append(BatchResult(item, None, f"渲染进程异常退出: {e}"))
+            except Exception as e:
+                logger.error("批量渲染失败 template=%s: %s", item.template, e)
+                results.append(BatchResult(item, None, f"{type(e).__name__}: {e}"))
+        return results
+
+    def _normalize(self, item):
+        item = item if isinstance(item, RenderItem) else RenderItem(*item)
+        if item.quality not in QUALITY_PRESETS:
+            raise ValueError(f"不支持的质量预设: {item.quality}")
+        return item._replace(params=canonical_params(item.params))
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_default_renderer = None
+_default_lock = threading.Lock()
+
+
+def render_batch(items):
+    """使用共享的常驻进程池渲染一批模板场景，参见 BatchRenderer.render"""
+    global _default_renderer
+    with _default_lock:
+        if _default_renderer is None:
+            _default_renderer = BatchRenderer()
+    return _default_renderer.render(items)
+
+
+def main():
+    """从 JSON 文件读取渲染项列表并批量渲染
+
+    文件内容形如 [{"template": "network", "params": {"layer_sizes": [3, 8, 2]}, "quality": "low"}, ...]
+    """
+    configure_logging()
+    if len(sys.argv) != 2:
+        raise SystemExit("usage: python batch_render.py items.json")
+    with open(sys.argv[1], encoding="utf-8") as f:
+        items = [RenderItem(**entry) for entry in json.load(f)]
+    with BatchRenderer() as renderer:
+        results = renderer.render(items)
+    for result in results:
+        print(json.dumps({
+            "template": result.item.template,
+            "params": result.item.params,
+            "quality": result.item.quality,
+            "video": result.video,
+            "error": result.error,
+        }, ensure_ascii=False))
+    if any(result.error for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+import numpy as np
+from manim import (
+    BLUE, OUT, RIGHT, TAU, WHITE, YELLOW, Animation, VGroup, VMobject, color_to_rgb, interpolate_color,
+    rgb_to_color, smooth
+)
+
+
+def line_segments(starts, ends):
+    """Bezier points for straight segments starts[i] -> ends[i], laid out as one VMobject points array"""
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    delta = ends - starts
+    # Each segment is one cubic curve (anchor, handle, handle, anchor); separate segments
+    # do not share anchors, so they become separate subpaths of the same path
+    return np.stack([starts, starts + delta / 3, starts + 2 * delta / 3, ends], axis=1).reshape(-1, 3)
+
+
+class DenseConnections(VGroup):
+    """All edges between two layers of points, drawn as a handful of path mobjects
+
+    Instead of one Line per neuron pair, every edge is a subpath of a shared points array.
+    Without weights that is a single VMobject. With a (len(starts), len(ends)) weights array
+    the edges are bucketed into ``levels`` VMobjects by weight: low weights get ``low_color``
+    and ``min_opacity``, high weights ``high_color`` and ``stroke_opacity``.
+    """
+
+    def __init__(
+        self,
+        starts,
+        ends,
+        weights=None,
+        levels=8,
+        color=WHITE,
+        low_color=BLUE,
+        high_color=YELLOW,
+        stroke_width=1,
+        stroke_opacity=1.0,
+        min_opacity=0.1,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+        self.edge_count = len(starts) * len(ends)
+        if self.edge_count == 0:
+            return
+
+        # Edge k joins starts[k // len(ends)] and ends[k % len(ends)]
+        edge_starts = np.repeat(starts, len(ends), axis=0)
+        edge_ends = np.tile(ends, (len(starts), 1))
+
+        if weights is None:
+            self.add(self._path(edge_starts, edge_ends, color, stroke_width, stroke_opacity))
+            return
+
+        weights = np.asarray(weights, dtype=float).reshape(-1)
+        if len(weights) != self.edge_count:
+            raise ValueError(
+                f"weights has {len(weights)} entries, expected {len(starts)}x{len(ends)}"
+            )
+        span = weights.max() - weights.min()
+        scaled = (weights - weights.min()) / span if span > 0 else np.ones_like(weights)
+        buckets = np.rint(scaled * (levels - 1)).astype(int) if levels > 1 else np.zeros(len(weights), int)
+        for level in np.unique(buckets):
+            alpha = level / (levels - 1) if levels > 1 else 1.0
+            mask = buckets == level
+            self.add(self._path(
+                edge_starts[mask],
+                edge_ends[mask],
+                interpolate_color(low_color, high_color, alpha),
+                stroke_width,
+                min_opacity + (stroke_opacity - min_opacity) * alpha,
+            ))
+
+    @staticmethod
+    def _path(starts, ends, color, stroke_width, stroke_opacity):
+        path = VMobject(stroke_color=color, stroke_width=stroke_width, stroke_opacity=stroke_opacity)
+        path.set_points(line_segments(starts, ends))
+        return path
+
+
+# Cubic Bezier approximation of a unit circle: four quarter arcs (anchor, handle, handle, anchor)
+_KAPPA = 4 * (np.sqrt(2) - 1) / 3
+_UNIT_DISC = np.array([
+    [1, 0, 0], [1, _KAPPA, 0], [_KAPPA, 1, 0], [0, 1, 0],
+    [0, 1, 0], [-_KAPPA, 1, 0], [-1, _KAPPA, 0], [-1, 0, 0],
+    [-1, 0, 0], [-1, -_KAPPA, 0], [-_KAPPA, -1, 0], [0, -1, 0],
+    [0, -1, 0], [_KAPPA, -1, 0], [1, -_KAPPA, 0], [1, 0, 0],
+])
+
+
+def disc_points(centers, radii):
+    """Bezier points for small discs around each center, laid out as one VMobject points array"""
+    centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(centers),))
+    return (centers[:, None, :] + radii[:, None, None] * _UNIT_DISC[None, :, :]).reshape(-1, 3)
+
+
+def _per_layer(value, depth_layers):
+    """A scalar, or one value per depth layer, as an array indexed by layer - 1"""
+    values = np.broadcast_to(np.asarray(value, dtype=float), (depth_layers,))
+    return np.array(values)
+
+
+class StarField(VGroup):
+    """Background stars, generated in one seeded NumPy pass and drawn as one path per depth layer
+
+    Stars are stored as arrays: ``positions`` (N, 3), ``layers`` (N,) in 1..depth_layers and
+    per-star ``radii`` and ``opacities``. ``radius`` and ``opacity`` are either scalars or one
+    value per depth layer. Stars in a layer share a style, so each layer is a single VMobject
+    whose subpaths are the star discs, instead of one Dot per star.
+    """
+
+    def __init__(
+        self,
+        is_3D=False,
+        num_stars=200,
+        width=14,
+        height=8,
+        depth=6,
+        depth_layers=1,
+        radius=0.02,
+        opacity=1.0,
+        color=WHITE,
+        seed=0,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        rng = np.random.default_rng(seed)
+        half_extent = np.array([width, height, depth if is_3D else 0]) / 2
+        self.positions = rng.uniform(-half_extent, half_extent, size=(num_stars, 3))
+        self.layers = rng.integers(1, depth_layers + 1, size=num_stars)
+        self.radii = _per_layer(radius, depth_layers)[self.layers - 1]
+        self.opacities = np.clip(_per_layer(opacity, depth_layers)[self.layers - 1], 0, 1)
+
+        for layer in np.unique(self.layers):
+            mask = self.layers == layer
+            path = VMobject(
+                fill_color=color,
+                fill_opacity=self.opacities[mask][0],
+                stroke_width=0,
+            )
+            path.set_points(disc_points(self.positions[mask], self.radii[mask]))
+            self.add(path)
+
+
+def _rgb_array(colors, count):
+    """A single manim color, a sequence of colors or an (N, 3) RGB array as an (N, 3) float array"""
+    if isinstance(colors, np.ndarray) and colors.ndim == 2:
+        return colors[:, :3].astype(float)
+    is_sequence = isinstance(colors, (list, tuple)) and len(colors) == count
+    if is_sequence and count and not isinstance(colors[0], (int, float, np.number)):
+        return np.array([color_to_rgb(color) for color in colors], dtype=float)
+    return np.tile(color_to_rgb(colors), (count, 1))
+
+
+class ParticleCloud(VGroup):
+    """Many small round particles stored as arrays and drawn as a few path mobjects
+
+    ``positions`` is (N, 3); ``radii``, ``opacities`` and ``colors`` are scalars or per-particle
+    values. Particles with the same color and opacity (quantized to ``opacity_levels``) share one
+    VMobject whose subpaths are their discs. set_positions rewrites the existing points arrays
+    in place, so animating the cloud never builds new mobjects.
+    """
+
+    def __init__(self, positions, radii=0.03, opacities=1.0, colors=WHITE, opacity_levels=8, **kwargs):
+        super().__init__(**kwargs)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        count = len(positions)
+        radii = np.broadcast_to(np.asarray(radii, dtype=float), (count,))
+        opacities = np.clip(np.broadcast_to(np.asarray(opacities, dtype=float), (count,)), 0, 1)
+        colors = _rgb_array(colors, count)
+        steps = max(opacity_levels - 1, 1)
+        levels = np.rint(opacities * steps) / steps
+
+        keys, inverse = np.unique(
+            self._bucket_columns(colors, levels), axis=0, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        # Particles are stored sorted by bucket, so every bucket is a contiguous slice
+        self.order = np.argsort(inverse, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(keys)))])
+        self.slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self.radii = radii[self.order]
+        self.opacities = opacities[self.order]
+        self.levels = levels[self.order]
+        self.colors = colors[self.order]
+        self._centers = positions[self.order]
+        self._offsets = self.radii[:, None, None] * _UNIT_DISC
+
+        for bucket in self.slices:
+            path = VMobject(
+                fill_color=rgb_to_color(self.colors[bucket.start]),
+                fill_opacity=self.levels[bucket.start],
+                stroke_width=0,
+            )
+            path.set_points(disc_points(self._centers[bucket], self.radii[bucket]))
+            self.add(path)
+
+    def _bucket_columns(self, colors, levels):
+        """Per-particle values that must be equal for particles to share a path"""
+        return np.column_stack([colors, levels])
+
+    def _original_order(self, values):
+        unsorted = np.empty_like(values)
+        unsorted[self.order] = values
+        return unsorted
+
+    def get_positions(self):
+        """Current particle centers (N, 3) in the original order, following any shift/scale/rotate"""
+        positions = np.empty_like(self._centers)
+        for path, bucket in zip(self.submobjects, self.slices):
+            count = bucket.stop - bucket.start
+            # The disc points are symmetric around the center, so their mean is the center
+            positions[bucket] = path.points.reshape(count, len(_UNIT_DISC), 3).mean(axis=1)
+        return self._original_order(positions)
+
+    def get_particles(self):
+        """(positions, radii, opacities, colors) arrays in the original order"""
+        return (
+            self.get_positions(),
+            self._original_order(self.radii),
+            self._original_order(self.opacities),
+            self._original_order(self.colors),
+        )
+
+    def set_positions(self, positions):
+        """Move the particles to ``positions`` (N, 3), given in the original order"""
+        self._centers[...] = np.asarray(positions, dtype=float)[self.order]
+        self._write_points()
+        return self
+
+    def _write_points(self):
+        for path, bucket in zip(self.submobjects, self.slices):
+            count = bucket.stop - bucket.start
+            shape = (count, len(_UNIT_DISC), 3)
+            if path.points.shape != (count * len(_UNIT_DISC), 3):
+                # An animation re-aligned the points; start from a fresh array
+                path.set_points(np.zeros((count * len(_UNIT_DISC), 3)))
+            np.add(self._centers[bucket, None, :], self._offsets[bucket], out=path.points.reshape(shape))
+
+
+class ParticleBridge(ParticleCloud):
+    """Particles moving from source to target positions while their color blends
+
+    Source and target positions are (N, 3) arrays, colors are per-particle. A fixed, seeded
+    jitter of size ``noise`` is added to both ends once. set_time(t) interpolates positions with
+    ``path_func(t)`` and colors with ``color_func(t)`` into preallocated buffers, so updating
+    from a ValueTracker every frame allocates nothing per particle.
+    """
+
+    def __init__(
+        self,
+        source_positions,
+        target_positions,
+        source_colors=WHITE,
+        target_colors=WHITE,
+        radii=0.03,
+        opacities=1.0,
+        noise=0.0,
+        seed=0,
+        path_func=smooth,
+        color_func=lambda t: t,
+        **kwargs
+    ):
+        source = np.asarray(source_positions, dtype=float).reshape(-1, 3)
+        target = np.asarray(target_positions, dtype=float).reshape(-1, 3)
+        if source.shape != target.shape:
+            raise ValueError(f"source has {len(source)} particles, target has {len(target)}")
+        rng = np.random.default_rng(seed)
+        source = source + noise * rng.standard_normal(source.shape)
+        target = target + noise * rng.standard_normal(target.shape)
+        self._target_rgb = _rgb_array(target_colors, len(target))
+        self.path_func = path_func
+        self.color_func = color_func
+        super().__init__(source, radii, opacities, source_colors, **kwargs)
+
+        self._source = source[self.order]
+        self._target = target[self.order]
+        self._scratch = np.empty_like(self._source)
+        self.target_colors = self._target_rgb[self.order]
+
+    def _bucket_columns(self, colors, levels):
+        return np.column_stack([colors, self._target_rgb, levels])
+
+    def set_time(self, t):
+        alpha = self.path_func(t)
+        np.multiply(self._source, 1 - alpha, out=self._centers)
+        np.multiply(self._target, alpha, out=self._scratch)
+        self._centers += self._scratch
+        self._write_points()
+
+        color_alpha = self.color_func(t)
+        for path, bucket in zip(self.submobjects, self.slices):
+            source_rgb = self.colors[bucket.start]
+            target_rgb = self.target_colors[bucket.start]
+            rgb = np.clip(source_rgb + (target_rgb - source_rgb) * color_alpha, 0, 1)
+            # Only the color changes; opacity is left to the scene (fades, set_opacity)
+            path.set_fill(rgb_to_color(rgb))
+        return self
+
+
+class ParticleSpiralIn(Animation):
+    """SpiralIn for a ParticleCloud, moving every particle in one vectorized pass per frame
+
+    Like manim's SpiralIn, each particle starts ``scale_factor`` times further from the cloud
+    center, moves straight back to its position while the whole cloud turns once around the
+    center, and the particles fade in over the first ``fade_in_fraction`` of the animation.
+    """
+
+    def __init__(self, cloud, scale_factor=8, fade_in_fraction=0.3, **kwargs):
+        self.scale_factor = scale_factor
+        self.fade_in_fraction = fade_in_fraction
+        super().__init__(cloud, introducer=True, **kwargs)
+
+    def begin(self):
+        self.final = self.mobject.get_positions()
+        self.center = self.mobject.get_center()
+        self.offsets = self.final - self.center
+        self._buffer = np.empty_like(self.final)
+        super().begin()
+
+    def interpolate_mobject(self, alpha):
+        alpha = self.rate_func(alpha)
+        # Radial offset shrinks linearly from (1 + scale_factor) to 1 while turning by TAU * alpha
+        np.multiply(self.offsets, 1 + self.scale_factor * (1 - alpha), out=self._buffer)
+        cos, sin = np.cos(TAU * alpha), np.sin(TAU * alpha)
+        x = self._buffer[:, 0].copy()
+        self._buffer[:, 0] = cos * x - sin * self._buffer[:, 1]
+        self._buffer[:, 1] = sin * x + cos * self._buffer[:, 1]
+        self._buffer += self.center
+        self.mobject.set_positions(self._buffer)
+
+        fade = min(1.0, alpha / self.fade_in_fraction) if self.fade_in_fraction > 0 else 1.0
+        for path, bucket in zip(self.mobject.submobjects, self.mobject.slices):
+            path.set_fill(opacity=self.mobject.levels[bucket.start] * fade)
+
+
+class StreamlineField(VGroup):
+    """A family of curves evaluated together and updated in place as a phase changes
+
+    ``path_func(phase, t)`` returns the points of every line at every sample of ``t`` as one
+    (lines, samples, 3) array. Each line is a polyline VMobject through its samples; set_phase
+    re-evaluates the whole family in one call and writes into the existing points arrays.
+    """
+
+    def __init__(self, path_func, t_range=(-np.pi, np.pi), samples=100, colors=WHITE,
+                 stroke_width=2, phase=0, **kwargs):
+        super().__init__(**kwargs)
+        self.path_func = path_func
+        self.t_values = np.linspace(t_range[0], t_range[1], samples)
+        lines = self._sample(phase)
+        colors = _rgb_array(colors, len(lines))
+        for line, rgb in zip(lines, colors):
+            path = VMobject(stroke_color=rgb_to_color(rgb), stroke_width=stroke_width)
+            path.set_points(line)
+            self.add(path)
+
+    def _sample(self, phase):
+        samples = np.asarray(self.path_func(phase, self.t_values), dtype=float)
+        samples = samples.reshape(-1, len(self.t_values), 3)
+        # Consecutive samples become straight cubic segments: (lines, (samples - 1) * 4, 3)
+        starts, delta = samples[:, :-1], np.diff(samples, axis=1)
+        segments = np.stack([starts, starts + delta / 3, starts + 2 * delta / 3, samples[:, 1:]], axis=2)
+        return segments.reshape(len(samples), -1, 3)
+
+    def set_phase(self, phase):
+        for path, line in zip(self.submobjects, self._sample(phase)):
+            if path.points.shape == line.shape:
+                path.points[...] = line
+            else:
+                path.set_points(line)
+        return self
+
+
+def _family_points(mobject):
+    """Members of the family that have points, their points concatenated, and each member's slice"""
+    members = mobject.family_members_with_points()
+    bounds = np.cumsum([0] + [len(member.points) for member in members])
+    slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    points = np.concatenate([member.points for member in members]) if members else np.zeros((0, 3))
+    return members, slices, points
+
+
+def _assign_points(mobject, points):
+    """Write points into the mobject's existing array when the shape allows, else replace it"""
+    if mobject.points.shape == points.shape:
+        mobject.points[...] = points
+    else:
+        mobject.set_points(np.array(points))
+
+
+def _write_family(members, slices, points):
+    for member, part in zip(members, slices):
+        _assign_points(member, points[part])
+
+
+def _map_points(func, points):
+    mapped = np.asarray(func(points), dtype=float)
+    if mapped.shape != points.shape:
+        raise ValueError(f"point map returned shape {mapped.shape}, expected {points.shape}")
+    return mapped
+
+
+def apply_point_map(mobject, func):
+    """Apply a vectorized map (N, 3) -> (N, 3) to every point of the mobject family in one call
+
+    The counterpart of Mobject.apply_function for maps written with numpy operations, which
+    apply_function would otherwise call once per point.
+    """
+    members, slices, points = _family_points(mobject)
+    _write_family(members, slices, _map_points(func, points))
+    return mobject
+
+
+class Deform(Animation):
+    """Animate a mobject family to func(points) for a vectorized map (N, 3) -> (N, 3)
+
+    The map is called once, on the concatenated points of the family, when the animation
+    begins; each frame then interpolates between the cached original and deformed arrays.
+    Plays like ``mobject.animate.apply_function(func)`` with a point-wise func.
+    """
+
+    def __init__(self, mobject, func, **kwargs):
+        self.func = func
+        super().__init__(mobject, **kwargs)
+
+    def begin(self):
+        self.members, self.slices, self.original = _family_points(self.mobject)
+        self.displacement = _map_points(self.func, self.original) - self.original
+        self._buffer = np.empty_like(self.original)
+        super().begin()
+
+    def interpolate_mobject(self, alpha):
+        np.multiply(self.displacement, self.rate_func(alpha), out=self._buffer)
+        self._buffer += self.original
+        _write_family(self.members, self.slices, self._buffer)
+
+
+class ArrowField(VGroup):
+    """Many arrows from (N, 3) start and end arrays, drawn as one shaft path and one tip path per color
+
+    Arrow color is mapped from magnitude: ``color_range`` is interpolated over
+    0..``max_magnitude`` (the largest arrow when None) in ``levels`` steps, and all arrows of a
+    step share a stroked shaft path and a filled tip path. set_vectors recomputes every shaft
+    and tip in one vectorized pass and writes into the existing points arrays.
+    """
+
+    def __init__(
+        self,
+        starts,
+        ends,
+        color_range=(WHITE, WHITE),
+        max_magnitude=None,
+        levels=8,
+        tip_length=0.2,
+        max_tip_length_to_length_ratio=0.25,
+        buff=0,
+        stroke_width=2,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        low, high = color_range
+        self.color_range = color_range
+        self.max_magnitude = max_magnitude
+        self.levels = levels if color_to_rgb(low).tolist() != color_to_rgb(high).tolist() else 1
+        self.tip_length = tip_length
+        self.max_tip_length_to_length_ratio = max_tip_length_to_length_ratio
+        self.buff = buff
+
+        self.shafts = VGroup()
+        self.tips = VGroup()
+        for level in range(self.levels):
+            color = interpolate_color(low, high, level / (self.levels - 1)) if self.levels > 1 else low
+            self.shafts.add(VMobject(stroke_color=color, stroke_width=stroke_width))
+            self.tips.add(VMobject(fill_color=color, fill_opacity=1, stroke_width=0))
+        self.add(self.shafts, self.tips)
+        self.set_vectors(starts, ends)
+
+    def set_vectors(self, starts, ends):
+        """Move the arrows to new (N, 3) start and end arrays"""
+        starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+        delta = ends - starts
+        magnitude = np.linalg.norm(delta, axis=1)
+        unit = delta / np.where(magnitude > 0, magnitude, 1)[:, None]
+        if self.buff:
+            starts = starts + unit * self.buff
+            ends = ends - unit * self.buff
+        length = np.maximum(magnitude - 2 * self.buff, 0)
+
+        tip = np.minimum(self.tip_length, self.max_tip_length_to_length_ratio * length)
+        base = ends - unit * tip[:, None]
+        # Tips lie in the plane of the arrow and OUT (RIGHT for arrows pointing along OUT)
+        side = np.cross(unit, OUT)
+        parallel = np.linalg.norm(side, axis=1) < 1e-6
+        side[parallel] = np.cross(unit[parallel], RIGHT)
+        side /= np.where(np.linalg.norm(side, axis=1) > 0, np.linalg.norm(side, axis=1), 1)[:, None]
+        half_width = side * (tip / 2)[:, None]
+        corners = np.stack([ends, base + half_width, base - half_width], axis=1)
+        # Each tip is a closed triangle: three straight segments, 12 points
+        triangles = line_segments(
+            corners.reshape(-1, 3), np.roll(corners, -1, axis=1).reshape(-1, 3)
+        ).reshape(len(starts), 12, 3)
+
+        scale = self.max_magnitude or (magnitude.max() if len(magnitude) else 1) or 1
+        steps = np.rint(np.clip(magnitude / scale, 0, 1) * (self.levels - 1)).astype(int)
+        for level, (shaft, tip_path) in enumerate(zip(self.shafts, self.tips)):
+            mask = steps == level
+            _assign_points(shaft, line_segments(starts[mask], base[mask]))
+            _assign_points(tip_path, triangles[mask].reshape(-1, 3))
+        return self
@@ -0,0 +1,88 @@
+"""Web 进程与渲染工具的导入耗时基准
+
+每个模块在全新的解释器中导入若干次，取最小耗时，并检查导入后没有加载
+不该加载的重量级依赖（manim、numpy、openai 只应在渲染进程或第一次调用 LLM 时加载）。
+与 import_time.json 中记录的基准比较，超出预算或加载了禁止的模块时返回非零退出码。
+
+用法：
+    python benchmarks/import_time.py            # 与基准比较
+    python benchmarks/import_time.py --record   # 重新记录基准
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).with_suffix(".json")
+
+# 模块 -> 导入后不应出现在 sys.modules 中的依赖
+MODULES = {
+    "executor": ["manim", "numpy", "openai", "gradio"],
+    # gradio 自身依赖 numpy，Web 进程无法避免
+    "app": ["manim", "openai"],
+    "api": ["manim", "openai", "uvicorn"],
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, forbidden, repeat):
+    """在独立进程中导入模块，返回 (最小耗时, 被加载的禁止模块)"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    # 导入期间不应需要密钥
+    env.pop("DEEPSEEK_API_KEY", None)
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, forbidden=forbidden)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(sample["seconds"])
+        loaded.update(sample["loaded"])
+    return min(timings), sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="把本次结果写入基准文件")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1.5, help="允许相对基准的倍数")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results = {}
+    failed = False
+    for module, forbidden in MODULES.items():
+        seconds, loaded = measure(module, forbidden, args.repeat)
+        results[module] = round(seconds, 3)
+        line = f"{module:<10} {seconds * 1000:8.1f} ms"
+        if module in baseline:
+            budget = baseline[module] * args.tolerance
+            line += f"  (基准 {baseline[module] * 1000:.1f} ms，预算 {budget * 1000:.1f} ms)"
+            if not args.record and seconds > budget:
+                line += "  超出预算"
+                failed = True
+        if loaded:
+            line += f"  加载了 {', '.join(loaded)}"
+            failed = True
+        print(line)
+
+    if args.record:
+        BASELINE.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"已写入 {BASELINE}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
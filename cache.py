@@ -0,0 +1,368 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
+from pathlib import Path
+
+
+def default_cache_dir():
+    """缓存根目录，可通过 CACHE_DIR 环境变量覆盖
+
+    设置了 RENDER_QUEUE（多节点渲染）时默认放在队列数据库所在的共享目录下，
+    各节点共用同一份失败缓存和渲染缓存，否则某个节点记录的失败其他节点看不到。
+    """
+    if os.getenv("CACHE_DIR"):
+        return Path(os.getenv("CACHE_DIR"))
+    if os.getenv("RENDER_QUEUE"):
+        return Path(os.getenv("RENDER_QUEUE")).parent / "cache"
+    return Path(tempfile.gettempdir()) / "math_to_manim" / "cache"
+
+
+class LLMCache:
+    """LLM 响应缓存
+
+    正常情况下只返回未过期的条目；API 降级（熔断打开）时允许返回过期条目，
+    保证已生成过的概念仍然可以访问。
+    """
+
+    def __init__(self, cache_dir=None, ttl=None):
+        self.cache_dir = Path(cache_dir or default_cache_dir()) / "llm"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if ttl is None:
+            ttl = float(os.getenv("LLM_CACHE_TTL", "86400"))
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def key(self, prompt):
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def _path(self, prompt):
+        return self.cache_dir / f"{self.key(prompt)}.json"
+
+    def get(self, prompt, allow_stale=False):
+        """读取缓存的响应内容，未命中时返回 None"""
+        path = self._path(prompt)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not allow_stale and time.time() - entry["created"] > self.ttl:
+            return None
+        return entry["content"]
+
+    def delete(self, prompt):
+        """删除条目（如生成的代码已确认无法渲染）"""
+        try:
+            self._path(prompt).unlink()
+        except FileNotFoundError:
+            pass
+
+    def set(self, prompt, content):
+        """写入响应内容（先写临时文件再原子替换）"""
+        path = self._path(prompt)
+        entry = {"created": time.time(), "content": content}
+        with self._lock:
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+
+
+def _strip_docstrings(tree):
+    """删除模块、类和函数开头的文档字符串"""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and \
+                    isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+class _LocalRenamer(ast.NodeTransformer):
+    """把函数内的局部变量按出现顺序重命名为 _v<深度>_<序号>
+
+    参数、global/nonlocal 声明的变量、类属性和模块级名称保持不变，
+    嵌套函数和 lambda 中对外层局部变量的引用会一并改名。
+    """
+
+    def __init__(self):
+        self.scopes = [{}]
+
+    @staticmethod
+    def _params(args):
+        names = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+        if args.vararg:
+            names.append(args.vararg.arg)
+        if args.kwarg:
+            names.append(args.kwarg.arg)
+        return set(names)
+
+    @staticmethod
+    def _local_stores(body):
+        """收集函数体直接作用域内被赋值的名称（按出现顺序）"""
+        names, declared = [], set()
+        stack = list(reversed(body))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (ast.Global, ast.Nonlocal)):
+                declared.update(node.names)
+                continue
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                if node.id not in names:
+                    names.append(node.id)
+                continue
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+                                 ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp,
+                                 ast.GeneratorExp)):
+                continue
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
+        return [n for n in names if n not in declared]
+
+    def _enter(self, shadowed, new_locals=()):
+        # 名称带上嵌套深度，避免内层新变量与外层改名后的变量冲突
+        depth = len(self.scopes)
+        mapping = {k: v for k, v in self.scopes[-1].items() if k not in shadowed}
+        for i, name in enumerate(new_locals):
+            mapping[name] = f"_v{depth}_{i}"
+        self.scopes.append(mapping)
+
+    def _visit_signature(self, node):
+        # 装饰器和参数默认值在外层作用域求值
+        for decorator in getattr(node, "decorator_list", []):
+            self.visit(decorator)
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(default)
+
+    def visit_FunctionDef(self, node):
+        self._visit_signature(node)
+        params = self._params(node.args)
+        self._enter(params, [n for n in self._local_stores(node.body) if n not in params])
+        node.body = [self.visit(stmt) for stmt in node.body]
+        self.scopes.pop()
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._visit_signature(node)
+        self._enter(self._params(node.args))
+        node.body = self.visit(node.body)
+        self.scopes.pop()
+        return node
+
+    def _visit_comprehension(self, node):
+        targets = {n.id for gen in node.generators
+                   for n in ast.walk(gen.target) if isinstance(n, ast.Name)}
+        self._enter(targets)
+        self.generic_visit(node)
+        self.scopes.pop()
+        return node
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def visit_ClassDef(self, node):
+        # 类体内的赋值是类属性，不参与改名，但方法仍可引用外层函数的局部变量
+        for expr in node.decorator_list + node.bases + [k.value for k in node.keywords]:
+            self.visit(expr)
+        for stmt in node.body:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.visit(stmt)
+        return node
+
+    def visit_Name(self, node):
+        new_name = self.scopes[-1].get(node.id)
+        if new_name is not None:
+            node.id = new_name
+        return node
+
+
+def canonicalize_code(code, rename_locals=True):
+    """将代码规范化：去掉注释和文档字符串、统一格式，可选地重命名局部变量
+
+    无法解析的代码只做空白规范化。
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return "\n".join(line.rstrip() for line in code.strip().splitlines() if line.strip())
+    tree = _strip_docstrings(tree)
+    if rename_locals:
+        tree = _LocalRenamer().visit(tree)
+    return ast.unparse(tree)
+
+
+def normalize_concept(concept):
+    """规范化用户输入的概念：统一全角/半角与大小写，合并空白"""
+    concept = unicodedata.normalize("NFKC", concept).casefold()
+    return " ".join(concept.split())
+
+
+def code_hash(code, render_config=None, rename_locals=True):
+    """渲染缓存键：规范化代码与渲染配置的 SHA-256"""
+    payload = canonicalize_code(code, rename_locals=rename_locals)
+    if render_config:
+        payload += "\n# render_config: " + json.dumps(render_config, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """渲染结果缓存，按 code_hash 保存生成的视频"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir or default_cache_dir()) / "render"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.mp4"
+
+    def get(self, key):
+        """返回缓存的视频路径，未命中时返回 None"""
+        path = self._path(key)
+        return path if path.exists() else None
+
+    def put(self, key, video_path):
+        """把渲染好的视频复制进缓存"""
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        shutil.copyfile(video_path, tmp)
+        os.replace(tmp, path)
+        return path
+
+
+def _link_or_copy(src, dst):
+    """硬链接（同一文件系统时不复制数据），失败时退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class PartialMovieCache:
+    """Manim 分段缓存（partial movie files）的共享副本
+
+    每个任务在独立的 media 目录中渲染，不会读到其他任务写了一半的分段，Manim 清理旧分段时
+    也只影响自己的目录。渲染前把共享副本中同名场景的分段硬链接进任务目录（Manim 视为缓存命中），
+    渲染成功后把新写入的完整分段以“临时文件 + 改名”原子地发布到共享副本。
+    每个质量和场景最多保留 max_files 个分段，超出时删除最旧的。
+    """
+
+    def __init__(self, cache_dir, max_files=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if max_files is None:
+            max_files = int(os.getenv("PARTIAL_CACHE_MAX_FILES", "100"))
+        self.max_files = max_files
+
+    @staticmethod
+    def _job_dirs(media_dir, module, scene):
+        """任务 media 目录中的分段目录：videos/<模块名>/<质量>/partial_movie_files/<场景名>"""
+        return (Path(media_dir) / "videos" / module).glob(f"*/partial_movie_files/{scene}")
+
+    def seed(self, media_dir, module, scene):
+        """把共享副本中该场景的分段链接进任务的 media 目录，返回链接的文件数"""
+        count = 0
+        for shared in self.cache_dir.glob(f"*/{scene}"):
+            target = Path(media_dir) / "videos" / module / shared.parent.name / "partial_movie_files" / scene
+            target.mkdir(parents=True, exist_ok=True)
+            for src in shared.glob("*.mp4"):
+                try:
+                    _link_or_copy(src, target / src.name)
+                except FileNotFoundError:
+                    continue  # 同时被其他任务清理
+                count += 1
+        return count
+
+    def publish(self, media_dir, module, scene):
+        """把任务新写入的分段发布到共享副本，返回发布的文件数"""
+        count = 0
+        for job_dir in self._job_dirs(media_dir, module, scene):
+            shared = self.cache_dir / job_dir.parent.parent.name / scene
+            shared.mkdir(parents=True, exist_ok=True)
+            for src in job_dir.glob("*.mp4"):
+                dst = shared / src.name
+                if dst.exists():
+                    continue
+                tmp = shared / f".{src.stem}.{uuid.uuid4().hex}.tmp"
+                _link_or_copy(src, tmp)
+                os.replace(tmp, dst)
+                count += 1
+            self._prune(shared)
+        return count
+
+    def _prune(self, shared):
+        files = []
+        for path in shared.glob("*.mp4"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_files)]:
+            # 已链接进任务目录的分段不受影响
+            path.unlink(missing_ok=True)
+
+
+def error_signature(message):
+    """错误签名：取最后一行异常信息，去掉路径、数字和地址后哈希，相同原因的失败签名相同"""
+    lines = [line.strip() for line in message.strip().splitlines() if line.strip()]
+    error_lines = [line for line in lines if re.match(r"^[\w.]*(Error|Exception)\b", line)]
+    summary = error_lines[-1] if error_lines else (lines[-1] if lines else "")
+    summary = re.sub(r"'[^']*[/\\][^']*'|\"[^\"]*[/\\][^\"]*\"", "<path>", summary)
+    summary = re.sub(r"0x[0-9a-fA-F]+|\d+", "N", summary)
+    return hashlib.sha256(summary.encode("utf-8")).hexdigest()[:16], summary
+
+
+class FailureCache:
+    """渲染失败缓存（负缓存）
+
+    按 code_hash 记录确定会失败的代码及其错误签名，有效期内再次提交相同代码时
+    直接返回之前的错误，不再占用渲染资源。
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, max_message_chars=4000):
+        self.cache_dir = Path(cache_dir or default_cache_dir()) / "failures"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if ttl is None:
+            ttl = float(os.getenv("FAILURE_CACHE_TTL", "3600"))
+        self.ttl = ttl
+        self.max_message_chars = max_message_chars
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """返回 {"signature", "summary", "message", "created"}，未命中或已过期时返回 None"""
+        if self.ttl <= 0:
+            return None
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            return None
+        return entry
+
+    def put(self, key, message):
+        """记录一次失败，返回错误签名"""
+        signature, summary = error_signature(message)
+        if self.ttl <= 0:
+            return signature
+        entry = {
+            "signature": signature,
+            "summary": summary,
+            # 只保留输出末尾，错误信息通常在最后
+            "message": message[-self.max_message_chars:],
+            "created": time.time(),
+        }
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return signature
@@ -1,6 +1,8 @@
 from manim import *
 import numpy as np
 
+from batched_mobjects import ArrowField, ParticleBridge
+
 class DiffusionOptimalTransport(Scene):
     def construct(self):
         self.setup_particles()
@@ -55,16 +57,18 @@ class DiffusionOptimalTransport(Scene):
             font_size=36
         ).to_edge(UP)
 
-        # Create interpolated particles
-        self.alpha_t = VGroup()
-        for p0, p1 in zip(self.alpha0, self.alpha1):
-            particle = p0.copy()
-            particle.add_updater(lambda m: m.move_to(
-                interpolate(p0.get_center(), p1.get_center(), self.tracker.get_value())
-            ).set_color(interpolate_color(
-                BLUE, GOLD, self.tracker.get_value()
-            )))
-            self.alpha_t.add(particle)
+        # Create interpolated particles: start and end positions are cached as arrays and
+        # a single group updater moves all of them in one vectorized step per frame
+        self.alpha_t = ParticleBridge(
+            [p0.get_center() for p0 in self.alpha0],
+            [p1.get_center() for p1 in self.alpha1],
+            source_colors=BLUE,
+            target_colors=GOLD,
+            radii=0.08,
+            path_func=linear,
+            color_func=linear
+        )
+        self.alpha_t.add_updater(lambda m: m.set_time(self.tracker.get_value()))
 
         self.play(Write(equation))
         self.add(self.alpha_t)
@@ -73,26 +77,18 @@ class DiffusionOptimalTransport(Scene):
         self.play(FadeOut(equation))
 
     def show_velocity_field(self):
-        arrows = VGroup()
-        for p0, p1 in zip(self.alpha0, self.alpha1):
-            # Get the vector between positions using get_center()
-            start_pos = p0.get_center()
-            end_pos = p1.get_center()
-            direction = end_pos - start_pos  # Now we're subtracting numpy arrays, not Dots
-            
-            arrow = Arrow(
-                start=start_pos,
-                end=start_pos + direction * 0.5,  # Scale the direction vector
-                buff=0,
-                color=WHITE,
-                max_tip_length=0.1
-            )
-            arrow.add_updater(lambda a, p0=p0, p1=p1: a.put_start_and_end_on(
-                interpolate(p0.get_center(), p1.get_center(), self.tracker.get_value()),
-                interpolate(p0.get_center(), p1.get_center(), self.tracker.get_value()) 
-                + (p1.get_center() - p0.get_center()) * 0.5
-            ))
-            arrows.add(arrow)
+        # One arrow field for all particle pairs, updated from position arrays
+        start_pos = np.array([p0.get_center() for p0 in self.alpha0])
+        end_pos = np.array([p1.get_center() for p1 in self.alpha1])
+        direction = (end_pos - start_pos) * 0.5  # Scale the direction vector
+        growth = ValueTracker(0)
+
+        def update_arrows(arrows):
+            starts = interpolate(start_pos, end_pos, self.tracker.get_value())
+            arrows.set_vectors(starts, starts + direction * growth.get_value())
+
+        arrows = ArrowField(start_pos, start_pos, color_range=(WHITE, WHITE), tip_length=0.1)
+        arrows.add_updater(update_arrows)
 
         equation = MathTex(
             r"\min_{\nu_t} \int \|\nu_t\|_{L^2(\alpha_t)}^2 dt",
@@ -100,7 +96,8 @@ class DiffusionOptimalTransport(Scene):
             font_size=36
         ).arrange(DOWN).to_edge(UP)
 
-        self.play(LaggedStart(*[GrowArrow(a) for a in arrows], lag_ratio=0.1))
+        self.add(arrows)
+        self.play(growth.animate.set_value(1), run_time=2)
         self.play(Write(equation))
         self.wait(2)
         self.play(FadeOut(arrows), FadeOut(equation))
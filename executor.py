@@ -0,0 +1,346 @@
+import os
+import re
+import uuid
+import shutil
+import logging
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+from cache import FailureCache, PartialMovieCache, RenderCache, code_hash
+from video import faststart, ensure_hls
+from streaming import LiveSegmenter, cleanup_live_dirs, PARTIAL_CACHED, PARTIAL_WRITTEN
+from telemetry import Trace, logger
+from metrics import record_cache
+
+# 渲染结果输出目录（通过 /media 路由对外提供，支持 Range 请求）；
+# 多节点渲染时指向各节点共享的存储
+OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "static/animations"))
+
+# 项目目录加入渲染进程的 PYTHONPATH，模板场景可以导入 text_to_manim
+PROJECT_DIR = Path(__file__).resolve().parent
+
+BACKGROUND_COLOR = "#1C1C1C"  # 深灰色背景
+
+# 渲染质量预设
+QUALITY_PRESETS = {
+    "low": {
+        "pixel_width": 854,
+        "pixel_height": 480,
+        "frame_rate": 30,
+    },
+    "medium": {
+        "pixel_width": 1280,
+        "pixel_height": 720,
+        "frame_rate": 30,
+    },
+    "high": {
+        "pixel_width": 1920,
+        "pixel_height": 1080,
+        "frame_rate": 60,
+    },
+    "ultra": {
+        "pixel_width": 3840,
+        "pixel_height": 2160,
+        "frame_rate": 60,
+    }
+}
+
+class KnownFailure(Exception):
+    """代码在负缓存有效期内已渲染失败过，未重新渲染"""
+
+
+# 环境或工具链问题：换一台机器或修好环境后同样的代码可以渲染，不能记入失败缓存
+ENVIRONMENT_FAILURE = re.compile(
+    r"No space left on device|Disk quota exceeded|\[Errno 28\]|MemoryError"
+    r"|No such file or directory: '(?:latex|xelatex|dvisvgm|ffmpeg|ffprobe)'"
+    r"|LaTeX (?:is )?not (?:installed|found)|latex: (?:command )?not found"
+    r"|\bffmpeg\b|FFmpegError|\bav\.error\b|BrokenPipeError"
+    r"|[Ff]ont\b[^\n]*not (?:found|available|installed)|fc-(?:list|match)",
+    re.IGNORECASE
+)
+# 代码本身出错时 Manim 会打印 Python 异常（如 "NameError: name 'x' is not defined"）
+CODE_FAILURE = re.compile(r"^\W*(?:[\w.]+\.)?\w*(?:Error|Exception)\b:?", re.MULTILINE)
+
+
+def is_code_failure(error):
+    """失败是否由代码本身导致（语法错误、Manim 报出 Python 异常或已知失败），而非环境问题
+
+    Manim 退出时先排除已知的环境错误（缺少 LaTeX/字体、ffmpeg 出错、磁盘已满等），
+    输出中还必须有 Python 异常，才认为是代码的问题。
+    """
+    while error is not None:
+        if isinstance(error, (KnownFailure, SyntaxError)):
+            return True
+        # 126/127 表示 manim 无法执行，大于 128（或为负）表示被信号终止，都与代码无关
+        if isinstance(error, subprocess.CalledProcessError) and 0 < error.returncode < 126:
+            output = error.output or error.stderr or ""
+            if isinstance(output, bytes):
+                output = output.decode("utf-8", "replace")
+            return not ENVIRONMENT_FAILURE.search(output) and bool(CODE_FAILURE.search(output))
+        error = error.__cause__
+    return False
+
+
+class ManimExecutor:
+    """Manim 代码执行器"""
+    def __init__(self):
+        self.temp_dir = Path(tempfile.gettempdir()) / "math_to_manim"
+        self.output_dir = OUTPUT_DIR
+        # 每个任务在自己的 media 目录中渲染，Manim 的分段缓存通过共享副本在任务间复用
+        self.partial_cache = PartialMovieCache(self.temp_dir / "partial_movies")
+        
+        # 渲染缓存：语义相同的代码（仅注释、格式、变量名不同）共用一个结果
+        self.render_cache = RenderCache()
+        # 负缓存：确定会失败的代码在有效期内不再重复渲染
+        self.failure_cache = FailureCache()
+        self.rename_locals = os.getenv("RENDER_CACHE_RENAME_LOCALS", "1") != "0"
+        
+        # 实时预览：渲染过程中把已完成的动画段转为 HLS 分片
+        self.live_preview = os.getenv("LIVE_PREVIEW", "1") != "0"
+        self.live_root = self.output_dir / "live"
+        
+        # 创建必要的目录
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 设置默认渲染配置
+        self.render_config = {
+            "pixel_width": 1920,      # 视频宽度
+            "pixel_height": 1080,     # 视频高度
+            "frame_rate": 60,         # 帧率
+            "background_color": BACKGROUND_COLOR,
+        }
+    
+    def extract_scene_name(self, code):
+        """从代码中提取场景类名"""
+        # 基类可以是 Scene、ThreeDScene 或模板生成的场景类
+        scene_match = re.search(r'class\s+(\w+)\s*\(\s*\w*Scene\s*\)', code)
+        if scene_match:
+            return scene_match.group(1)
+        return "MathScene"
+    
+    def prepare_code(self, code):
+        """准备代码，添加必要的配置"""
+        # 检查是否需要使用 ThreeDScene
+        is_3d = "frame = self.camera.frame" in code
+        
+        config_code = f"""
+# 设置渲染配置
+config.pixel_width = {self.render_config['pixel_width']}
+config.pixel_height = {self.render_config['pixel_height']}
+config.frame_rate = {self.render_config['frame_rate']}
+config.background_color = "{self.render_config['background_color']}"
+
+"""
+        # 如果代码中使用了 camera.frame，需要使用 ThreeDScene
+        if is_3d:
+            code = code.replace("(Scene):", "(ThreeDScene):")
+            logger.info("检测到3D场景需求，已将Scene替换为ThreeDScene")
+        
+        # 在 imports 后添加配置
+        if "from manim import *" in code:
+            code = code.replace(
+                "from manim import *",
+                "from manim import *\n" + config_code
+            )
+        else:
+            code = "from manim import *\n" + config_code + code
+        
+        return code
+    
+    def cache_key(self, code):
+        """渲染缓存键（规范化代码 + 渲染配置），同时用于合并进行中的相同渲染"""
+        return code_hash(code, self.render_config, rename_locals=self.rename_locals)
+
+    def check_known_failure(self, code, trace=None):
+        """代码在负缓存中时抛出 KnownFailure，携带之前的错误信息"""
+        entry = self.failure_cache.get(self.cache_key(code))
+        record_cache("failure", entry is not None)
+        if entry is None:
+            return
+        if trace is not None:
+            trace.event("failure_cache_hit", signature=entry["signature"])
+        age = int(time.time() - entry["created"])
+        raise KnownFailure(f"相同代码在 {age} 秒前已渲染失败，未重新渲染。{entry['message']}")
+
+    def execute(self, code, trace=None):
+        """执行 Manim 代码并返回生成的视频路径"""
+        runner = self.execute_iter(code, trace)
+        try:
+            while True:
+                next(runner)
+        except StopIteration as stop:
+            return stop.value
+
+    def execute_iter(self, code, trace=None):
+        """执行 Manim 代码的生成器版本
+
+        渲染过程中每完成一段动画就产出一个 LiveSegment（实时预览分片），
+        结束后通过 StopIteration 返回生成的视频路径。
+        """
+        trace = trace or Trace()
+        job_dir = None
+        process = None
+        try:
+            scene_name = self.extract_scene_name(code)
+            with trace.span("validate", scene=scene_name):
+                # 语法错误无需启动 Manim 即可发现
+                compile(code, f"<{scene_name}>", "exec")
+            
+            cache_key = self.cache_key(code)
+            output_file = self.output_dir / f"{scene_name}_{cache_key[:16]}.mp4"
+            cached_video = self.render_cache.get(cache_key)
+            record_cache("render", cached_video is not None)
+            if cached_video:
+                trace.event("render_cache_hit", key=cache_key[:16])
+                if not output_file.exists():
+                    shutil.copyfile(cached_video, output_file)
+                with trace.span("encode", cached=True):
+                    self.postprocess_hls(output_file, trace)
+                return str(output_file)
+            
+            prepared_code = self.prepare_code(code)
+            # 每个任务使用独立目录，避免并发渲染互相覆盖
+            job_id = uuid.uuid4().hex
+            job_dir = self.temp_dir / "jobs" / job_id
+            job_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = job_dir / "temp_scene.py"
+            temp_file.write_text(prepared_code, encoding='utf-8')
+            trace.dump("scene.py", prepared_code)
+            # 独立的 media 目录：并发任务不会读到彼此写了一半的分段，也不会清理彼此的分段
+            media_dir = job_dir / "media"
+            seeded = self.partial_cache.seed(media_dir, temp_file.stem, scene_name)
+            
+            manim_cmd = (
+                f"manim -pqh --fps {self.render_config['frame_rate']} "
+                f"--media_dir \"{media_dir}\" -o {job_id} \"{temp_file}\" {scene_name}"
+            )
+            # 在Windows上使用gbk编码
+            if os.name == 'nt':
+                cmd = f"chcp 65001 && {manim_cmd}"
+            else:
+                cmd = manim_cmd
+            logger.debug("job=%s manim command: %s", trace.job_id, cmd)
+            
+            segmenter = None
+            if self.live_preview:
+                cleanup_live_dirs(self.live_root)
+                segmenter = LiveSegmenter(
+                    self.live_root / job_id,
+                    media_dir / "videos" / temp_file.stem,
+                    scene_name
+                )
+            
+            with trace.span("render", scene=scene_name) as fields:
+                # 逐行读取输出，以便在渲染过程中推送已完成的分段
+                # 在Windows上设置encoding='gbk'；加大 COLUMNS 避免日志中的长路径被折行
+                process = subprocess.Popen(
+                    cmd,
+                    shell=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    encoding='gbk' if os.name == 'nt' else 'utf-8',
+                    errors='replace',
+                    env={
+                        **os.environ,
+                        "COLUMNS": "10000",
+                        "PYTHONPATH": os.pathsep.join(
+                            filter(None, [str(PROJECT_DIR), os.environ.get("PYTHONPATH")])
+                        ),
+                    }
+                )
+                output_lines = []
+                partial_hits = partial_misses = 0
+                for line in process.stdout:
+                    output_lines.append(line)
+                    # Manim 的分段缓存：每个 play 调用要么复用缓存，要么重新渲染
+                    if PARTIAL_CACHED.search(line):
+                        partial_hits += 1
+                        record_cache("partial_movie", True)
+                    elif PARTIAL_WRITTEN.search(line):
+                        partial_misses += 1
+                        record_cache("partial_movie", False)
+                    if segmenter is not None:
+                        try:
+                            yield from segmenter.feed(line)
+                        except (OSError, subprocess.CalledProcessError) as e:
+                            trace.event("live_preview_disabled", level=logging.WARNING, error=e)
+                            segmenter = None
+                returncode = process.wait()
+                output = "".join(output_lines)
+                trace.dump("manim.log", output)
+                fields.update(
+                    returncode=returncode, partial_hits=partial_hits, partial_misses=partial_misses,
+                    partial_seeded=seeded
+                )
+                if returncode != 0:
+                    raise subprocess.CalledProcessError(returncode, cmd, output=output, stderr=output)
+                # 只发布成功渲染的分段：失败时最后一个分段可能不完整
+                try:
+                    self.partial_cache.publish(media_dir, temp_file.stem, scene_name)
+                except OSError as e:
+                    trace.event("partial_cache_publish_failed", level=logging.WARNING, error=e)
+                if segmenter is not None:
+                    try:
+                        yield from segmenter.finish()
+                    except (OSError, subprocess.CalledProcessError) as e:
+                        trace.event("live_preview_failed", level=logging.WARNING, error=e)
+                    fields["live_segments"] = len(segmenter.segments)
+            
+            with trace.span("move"):
+                # 输出位于 media/videos/<模块名>/<质量>/<job_id>.mp4
+                video_files = list((media_dir / "videos" / temp_file.stem).glob(f"*/{job_id}.mp4"))
+                if not video_files:
+                    raise Exception("未找到生成的视频文件")
+                shutil.move(str(video_files[0]), output_file)
+            
+            with trace.span("encode"):
+                # 优化视频以便边下边播
+                try:
+                    faststart(output_file)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    trace.event("faststart_failed", level=logging.WARNING, error=e)
+                self.render_cache.put(cache_key, output_file)
+                self.postprocess_hls(output_file, trace)
+            
+            trace.event("video_ready", path=output_file)
+            return str(output_file)
+        except SyntaxError as e:
+            error_msg = f"代码语法错误（第 {e.lineno} 行）: {e.msg}"
+            logger.error("job=%s %s", trace.job_id, error_msg)
+            raise Exception(error_msg) from e
+        except subprocess.CalledProcessError as e:
+            error_msg = f"Manim 执行错误:\n{e.stderr if hasattr(e, 'stderr') else str(e)}"
+            logger.error("job=%s Manim 执行错误 returncode=%s", trace.job_id, e.returncode)
+            if is_code_failure(e):
+                signature = self.failure_cache.put(cache_key, error_msg)
+                trace.event("failure_cached", signature=signature)
+            raise Exception(error_msg) from e
+        except Exception as e:
+            error_msg = f"动画生成失败: {str(e)}"
+            logger.error("job=%s %s", trace.job_id, error_msg)
+            raise Exception(error_msg) from e
+        finally:
+            if process is not None and process.poll() is None:
+                process.kill()
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    def postprocess_hls(self, video_file, trace=None):
+        """长视频额外生成 HLS 分片，失败时只使用 MP4"""
+        trace = trace or Trace()
+        try:
+            playlist = ensure_hls(video_file)
+            if playlist:
+                trace.event("hls_ready", playlist=playlist)
+        except (OSError, subprocess.CalledProcessError) as e:
+            trace.event("hls_failed", level=logging.WARNING, error=e)
+
+    def set_quality(self, quality_preset="high"):
+        """设置渲染质量预设"""
+        if quality_preset in QUALITY_PRESETS:
+            self.render_config.update(QUALITY_PRESETS[quality_preset])
+        else:
+            raise ValueError(f"不支持的质量预设: {quality_preset}")
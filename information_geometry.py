@@ -1,21 +1,7 @@
 from manim import *
 import numpy as np
 
-class StarField3D(VGroup):
-    """3D starfield background with parallax effect"""
-    def __init__(self, num_stars=200, depth_layers=5, **kwargs):
-        super().__init__(**kwargs)
-        for _ in range(num_stars):
-            layer = np.random.randint(1, depth_layers+1)
-            star = Dot3D(
-                point=[np.random.uniform(-7,7), 
-                      np.random.uniform(-4,4),
-                      np.random.uniform(-5,5)],
-                radius=0.01 + 0.005*layer,
-                color=WHITE
-            )
-            star.set_opacity(0.3 + 0.1*layer)  # Set opacity after creation
-            self.add(star)
+from batched_mobjects import ArrowField, StarField
 
 class InformationGeometryScene(ThreeDScene):
     def construct(self):
@@ -35,7 +21,12 @@ class InformationGeometryScene(ThreeDScene):
         # 1. COSMIC INTRODUCTION
         ####################################################################
         # Create starfield but don't add it yet
-        star_field = StarField3D(num_stars=400, depth_layers=8)
+        # Nearer depth layers are larger and brighter (parallax effect)
+        star_field = StarField(
+            is_3D=True, num_stars=400, depth=10, depth_layers=8,
+            radius=[0.01 + 0.005*layer for layer in range(1, 9)],
+            opacity=[0.3 + 0.1*layer for layer in range(1, 9)]
+        )
         
         # Move title to better position
         title = Text("Information Geometry:\nThe Landscape of Probability", 
@@ -135,21 +126,13 @@ class InformationGeometryScene(ThreeDScene):
         # 4. LOGARITHMIC LENS EFFECT
         ####################################################################
         # Create warping effect for log transform
-        lens_group = VGroup()
-        for particle in particles:
-            x, y, z = particle.get_center()
-            log_z = np.log(z/np.exp(-((x-1)**2 + (y-0.5)**2)))
-            arrow = Arrow3D(
-                start=particle.get_center(),
-                end=[x, y, log_z],
-                color=WHITE
-            )
-            lens_group.add(arrow)
+        # All lens arrows are built in one pass as a single arrow field
+        starts = np.array([particle.get_center() for particle in particles])
+        x, y, z = starts.T
+        log_z = np.log(z/np.exp(-((x-1)**2 + (y-0.5)**2)))
+        lens_group = ArrowField(starts, np.column_stack([x, y, log_z]), color_range=(WHITE, WHITE))
         
-        self.play(
-            LaggedStart(*[Create(a) for a in lens_group], lag_ratio=0.1),
-            run_time=3
-        )
+        self.play(Create(lens_group), run_time=3)
         self.wait(2)
         
         ####################################################################
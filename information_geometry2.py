@@ -1,21 +1,7 @@
 from manim import *
 import numpy as np
 
-class StarField3D(VGroup):
-    """3D starfield with depth-based scaling"""
-    def __init__(self, num_stars=400, depth_layers=8, **kwargs):
-        super().__init__(**kwargs)
-        for _ in range(num_stars):
-            layer = np.random.randint(1, depth_layers+1)
-            star = Dot3D(
-                point=[np.random.uniform(-7,7), 
-                      np.random.uniform(-4,4),
-                      np.random.uniform(-5,5)],
-                radius=0.005,
-                color=WHITE
-            ).scale(0.5/layer)
-            star.set_opacity(0.3 + 0.1*layer)
-            self.add(star)
+from batched_mobjects import ArrowField, StarField
 
 class InformationGeometryScene(ThreeDScene):
     def construct(self):
@@ -33,7 +19,12 @@ class InformationGeometryScene(ThreeDScene):
         ####################################################################
         # 1. COSMIC INTRODUCTION
         ####################################################################
-        star_field = StarField3D()
+        # 3D starfield with depth-based scaling
+        star_field = StarField(
+            is_3D=True, num_stars=400, depth=10, depth_layers=8,
+            radius=[0.0025/layer for layer in range(1, 9)],
+            opacity=[0.3 + 0.1*layer for layer in range(1, 9)]
+        )
         title = Text("Information Geometry:\nThe Landscape of Probability", 
                     font_size=42, gradient=(PURPLE, TEAL))
         title.to_edge(UP).shift(DOWN * 0.5)
@@ -133,25 +124,13 @@ class InformationGeometryScene(ThreeDScene):
         ####################################################################
         # 4. LOGARITHMIC LENS EFFECT (USING CONES)
         ####################################################################
-        lens_group = VGroup()
-        for u, v, particle in particle_data:
-            x, y, z = particle.get_center()
-            log_z = np.log(z/np.exp(-((x-1)**2 + (y-0.5)**2)))
-            arrow = Cone(
-                direction=UP,
-                base_radius=0.05,
-                height=0.5,
-                color=WHITE
-            ).put_start_and_end_on(
-                particle.get_center(),
-                [x, y, log_z]
-            )
-            lens_group.add(arrow)
+        # All lens arrows are built in one pass as a single arrow field
+        starts = np.array([particle.get_center() for _, _, particle in particle_data])
+        x, y, z = starts.T
+        log_z = np.log(z/np.exp(-((x-1)**2 + (y-0.5)**2)))
+        lens_group = ArrowField(starts, np.column_stack([x, y, log_z]), color_range=(WHITE, WHITE))
         
-        self.play(
-            LaggedStart(*[Create(a) for a in lens_group], lag_ratio=0.1),
-            run_time=3
-        )
+        self.play(Create(lens_group), run_time=3)
         self.wait(2)
         
         ####################################################################
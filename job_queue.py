@@ -0,0 +1,290 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import closing, contextmanager
+
+# 被某个 worker 领取的任务
+ClaimedJob = namedtuple("ClaimedJob", "id payload attempts")
+
+LOST_WORKER_ERROR = "渲染节点失联，已超过最大重试次数"
+
+# 失败类型：code 表示代码本身有错（见 executor.is_code_failure），environment 表示渲染环境问题
+CODE_FAILURE = "code"
+ENVIRONMENT_FAILURE = "environment"
+
+
+class SQLiteJobQueue:
+    """持久化渲染任务队列
+
+    数据库文件放在所有节点都能访问的共享存储上：Web 进程只负责入队，
+    各节点上的 worker 领取任务并定期发送心跳。心跳超过 lease_seconds 未更新的任务
+    视为 worker 已失联，会被重新放回队列（超过 max_attempts 次后标记为失败）。
+    提交方不再等待结果时把任务标记为 cancelled，worker 不会再领取，执行中的 worker 续租失败后放弃。
+    心跳时间使用墙上时钟，各节点需要同步时间。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        worker TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        heartbeat REAL,
+        progress TEXT,
+        result TEXT,
+        error TEXT,
+        error_kind TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        if path is None:
+            path = os.getenv("RENDER_QUEUE")
+        if lease_seconds is None:
+            lease_seconds = float(os.getenv("RENDER_QUEUE_LEASE", "60"))
+        if max_attempts is None:
+            max_attempts = int(os.getenv("RENDER_QUEUE_MAX_ATTEMPTS", "3"))
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.executescript(self.SCHEMA)
+            # 旧版本创建的数据库没有 error_kind 列；多个节点同时升级时只有一个能加成功
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "error_kind" not in columns:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN error_kind TEXT")
+                except sqlite3.OperationalError:
+                    pass
+
+    @contextmanager
+    def _transaction(self, immediate=False):
+        # 每次操作使用独立连接，可在多线程、多进程和多台机器间共用同一个文件；
+        # 网络文件系统不支持 WAL，使用默认的回滚日志
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def enqueue(self, payload, job_id=None):
+        """加入一个任务，返回任务 ID"""
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, payload, status, created, updated) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, json.dumps(payload), now, now)
+            )
+        return job_id
+
+    def _reclaim(self, conn, now):
+        """把心跳超时的任务放回队列，重试次数用尽的标记为失败"""
+        expired = now - self.lease_seconds
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, error_kind = ?, worker = NULL, updated = ? "
+            "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+            (LOST_WORKER_ERROR, ENVIRONMENT_FAILURE, now, expired, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, progress = NULL, updated = ? "
+            "WHERE status = 'running' AND heartbeat < ?",
+            (now, expired)
+        )
+
+    def claim(self, worker_id):
+        """领取最早入队的任务，没有任务时返回 None"""
+        now = time.time()
+        with self._transaction(immediate=True) as conn:
+            self._reclaim(conn, now)
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "heartbeat = ?, updated = ? WHERE id = ?",
+                (worker_id, now, now, row["id"])
+            )
+        return ClaimedJob(row["id"], json.loads(row["payload"]), row["attempts"] + 1)
+
+    def heartbeat(self, job_id, worker_id, progress=None):
+        """续租并可附带进度；任务已被回收时返回 False"""
+        now = time.time()
+        with self._transaction() as conn:
+            if progress is None:
+                cursor = conn.execute(
+                    "UPDATE jobs SET heartbeat = ?, updated = ? "
+                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                    (now, now, job_id, worker_id)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET heartbeat = ?, progress = ?, updated = ? "
+                    "WHERE id = ? AND worker = ? AND status = 'running'",
+                    (now, json.dumps(progress), now, job_id, worker_id)
+                )
+            return cursor.rowcount == 1
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None, error_kind=None):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, error_kind = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result), error, error_kind, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        """记录任务结果；任务已被回收时返回 False"""
+        return self._finish(job_id, worker_id, "succeeded", result=result)
+
+    def fail(self, job_id, worker_id, error, error_kind=ENVIRONMENT_FAILURE):
+        """记录失败及其类型（CODE_FAILURE / ENVIRONMENT_FAILURE）；任务已被回收时返回 False"""
+        return self._finish(job_id, worker_id, "failed", error=error, error_kind=error_kind)
+
+    def cancel(self, job_id, error):
+        """取消尚未结束的任务（排队中或执行中），任务已结束时返回 False"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', error = ?, worker = NULL, updated = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (error, now, job_id)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """任务状态字典（status、attempts、progress、result、error、error_kind），不存在时返回 None"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT status, attempts, progress, result, error, error_kind FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "progress": json.loads(row["progress"]) if row["progress"] else None,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "error_kind": row["error_kind"],
+        }
+
+    def counts(self):
+        """各状态的任务数"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class LocalJobQueue:
+    """进程内的队列替身，接口与 SQLiteJobQueue 相同，用于测试和单机调试"""
+
+    def __init__(self, lease_seconds=60, max_attempts=3, clock=time.time):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        now = self.clock()
+        with self._lock:
+            self.jobs[job_id] = {
+                "payload": json.loads(json.dumps(payload)), "status": "queued", "worker": None,
+                "attempts": 0, "heartbeat": None, "progress": None, "result": None,
+                "error": None, "error_kind": None, "created": now,
+            }
+        return job_id
+
+    def _reclaim(self, now):
+        for job in self.jobs.values():
+            if job["status"] == "running" and job["heartbeat"] < now - self.lease_seconds:
+                job["worker"] = None
+                if job["attempts"] >= self.max_attempts:
+                    job.update(status="failed", error=LOST_WORKER_ERROR, error_kind=ENVIRONMENT_FAILURE)
+                else:
+                    job.update(status="queued", progress=None)
+
+    def claim(self, worker_id):
+        now = self.clock()
+        with self._lock:
+            self._reclaim(now)
+            queued = [(job["created"], job_id) for job_id, job in self.jobs.items() if job["status"] == "queued"]
+            if not queued:
+                return None
+            job_id = min(queued)[1]
+            job = self.jobs[job_id]
+            job.update(status="running", worker=worker_id, heartbeat=now, attempts=job["attempts"] + 1)
+            return ClaimedJob(job_id, job["payload"], job["attempts"])
+
+    def _owned(self, job_id, worker_id):
+        job = self.jobs.get(job_id)
+        if job is None or job["worker"] != worker_id or job["status"] != "running":
+            return None
+        return job
+
+    def heartbeat(self, job_id, worker_id, progress=None):
+        with self._lock:
+            job = self._owned(job_id, worker_id)
+            if job is None:
+                return False
+            job["heartbeat"] = self.clock()
+            if progress is not None:
+                job["progress"] = progress
+            return True
+
+    def _finish(self, job_id, worker_id, status, result=None, error=None, error_kind=None):
+        with self._lock:
+            job = self._owned(job_id, worker_id)
+            if job is None:
+                return False
+            job.update(status=status, result=result, error=error, error_kind=error_kind)
+            return True
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, "succeeded", result=result)
+
+    def fail(self, job_id, worker_id, error, error_kind=ENVIRONMENT_FAILURE):
+        return self._finish(job_id, worker_id, "failed", error=error, error_kind=error_kind)
+
+    def cancel(self, job_id, error):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] not in ("queued", "running"):
+                return False
+            job.update(status="cancelled", error=error, worker=None)
+            return True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                key: job[key] for key in ("status", "attempts", "progress", "result", "error", "error_kind")
+            }
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
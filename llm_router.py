@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from rate_limit import RequestCancelled
+
+
+class LatencyHistogram:
+    """延迟直方图（单位：秒），用于根据实际数据调整延迟预算"""
+    DEFAULT_BUCKETS = (1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """记录一次耗时"""
+        with self._lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q):
+        """按桶上界估算分位数，没有数据时返回 None"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+                seen += n
+                if seen >= target:
+                    return bound
+        return float("inf")
+
+    def snapshot(self):
+        """返回累计桶计数、总和与次数"""
+        with self._lock:
+            cumulative = []
+            seen = 0
+            for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+                seen += n
+                cumulative.append((bound, seen))
+            return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class LLMRouter:
+    """带延迟预算的模型路由
+
+    请求先发给主模型（deepseek-reasoner）；若超过延迟预算仍未得到有效结果，
+    则向快速模型发起对冲请求，先返回有效结果的一方胜出，另一方被取消。
+    """
+
+    def __init__(self, client=None, primary_model=None, hedge_model=None,
+                 latency_budget=None, limiter=None, max_workers=32, client_factory=None):
+        if client is None and client_factory is None:
+            raise ValueError("client 与 client_factory 至少提供一个")
+        self._client = client
+        self._client_factory = client_factory
+        self.limiter = limiter
+        self.primary_model = primary_model or os.getenv("LLM_PRIMARY_MODEL", "deepseek-reasoner")
+        self.hedge_model = hedge_model or os.getenv("LLM_HEDGE_MODEL", "deepseek-chat")
+        if latency_budget is None:
+            latency_budget = float(os.getenv("LLM_LATENCY_BUDGET", "90"))
+        self.latency_budget = latency_budget
+        self.expected_output_tokens = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "8000"))
+
+        self.histograms = {
+            "primary": LatencyHistogram(),
+            "hedge": LatencyHistogram(),
+        }
+        # 落败后被取消的调用：只知道耗时至少为取消前已等待的时间（删失观测），单独统计，
+        # 不混入完成耗时，否则慢的路由总被取消，分位数会被低估
+        self.censored = {route: LatencyHistogram() for route in self.histograms}
+        self.outcomes = {
+            route: {"won": 0, "invalid": 0, "failed": 0, "cancelled": 0}
+            for route in self.histograms
+        }
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-route")
+
+    @property
+    def client(self):
+        """API 客户端，传入 client_factory 时在第一次请求时才创建"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def _record(self, route, outcome):
+        with self._lock:
+            self.outcomes[route][outcome] += 1
+
+    def estimate_tokens(self, messages):
+        """粗略估算一次请求消耗的 token 数（输入按字符数计，输出取预期值）"""
+        return sum(len(m.get("content", "")) for m in messages) + self.expected_output_tokens
+
+    def _call(self, route, model, messages, cancel_event, on_first_token=None):
+        """以流式方式调用模型，便于在落败时及时关闭连接
+
+        on_first_token(route) 在收到第一段内容时调用（每个路由至多一次）。
+        """
+        start = time.monotonic()
+
+        def request():
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            parts = []
+            used_tokens = None
+            try:
+                for chunk in stream:
+                    if cancel_event.is_set():
+                        raise RequestCancelled(f"{route} 请求已取消")
+                    if chunk.usage is not None:
+                        used_tokens = chunk.usage.total_tokens
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not parts and on_first_token is not None:
+                            on_first_token(route)
+                        parts.append(chunk.choices[0].delta.content)
+            finally:
+                stream.close()
+            return "".join(parts), used_tokens
+
+        try:
+            if self.limiter is None:
+                content, _ = request()
+            else:
+                content = self.limiter.call(request, self.estimate_tokens(messages), cancel_event)
+        except RequestCancelled:
+            self.censored[route].observe(time.monotonic() - start)
+            raise
+        self.histograms[route].observe(time.monotonic() - start)
+        return content
+
+    def _submit(self, route, messages, cancel_events, on_first_token=None):
+        model = self.primary_model if route == "primary" else self.hedge_model
+        cancel_events[route] = threading.Event()
+        return self._pool.submit(
+            self._call, route, model, messages, cancel_events[route], on_first_token
+        )
+
+    def complete(self, messages, validate=None, on_first_token=None):
+        """执行一次路由后的补全请求，返回 (内容, 胜出路由)
+
+        validate 用于判断响应是否有效，抛出异常即视为无效；
+        on_first_token(route) 在各路由收到第一段内容时调用。
+        """
+        cancel_events = {}
+        futures = {self._submit("primary", messages, cancel_events, on_first_token): "primary"}
+        deadline = time.monotonic() + self.latency_budget
+        hedged = False
+        last_error = None
+
+        while futures:
+            timeout = None if hedged else max(0.0, deadline - time.monotonic())
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                route = futures.pop(future)
+                try:
+                    content = future.result()
+                except RequestCancelled:
+                    self._record(route, "cancelled")
+                    continue
+                except Exception as e:
+                    self._record(route, "failed")
+                    last_error = e
+                    continue
+
+                if validate is not None:
+                    try:
+                        validate(content)
+                    except Exception as e:
+                        self._record(route, "invalid")
+                        last_error = e
+                        continue
+
+                self._record(route, "won")
+                for other in futures.values():
+                    cancel_events[other].set()
+                    self._record(other, "cancelled")
+                return content, route
+
+            # 超出预算或主模型提前失败时，发起对冲请求
+            if not hedged and (not done or not futures):
+                futures[self._submit("hedge", messages, cancel_events, on_first_token)] = "hedge"
+                hedged = True
+
+        raise last_error or RuntimeError("所有路由均未返回有效结果")
+
+    def latency_report(self):
+        """各路由的延迟分位数与结果统计，用于调整延迟预算"""
+        report = {}
+        for route, histogram in self.histograms.items():
+            report[route] = {
+                "p50": histogram.quantile(0.5),
+                "p90": histogram.quantile(0.9),
+                "p99": histogram.quantile(0.99),
+                "count": histogram.count,
+                # 被取消调用的已等待时间中位数，是该路由实际耗时的下界
+                "censored_p50": self.censored[route].quantile(0.5),
+                "censored_count": self.censored[route].count,
+                **self.outcomes[route],
+            }
+        return report
@@ -0,0 +1,227 @@
+import threading
+
+from llm_router import LatencyHistogram
+
+# 覆盖从毫秒级的编码步骤到数分钟的 LLM 生成与渲染
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(name, documentation, kind):
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+
+
+def histogram_lines(name, labels, snapshot):
+    """把 LatencyHistogram.snapshot() 转为 Prometheus 直方图样本行"""
+    lines = []
+    for bound, count in snapshot["buckets"]:
+        bucket_labels = tuple(labels) + (("le", _format_value(float(bound))),)
+        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+    return lines
+
+
+class Counter:
+    """按标签分组的计数器"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def collect(self):
+        lines = _header(self.name, self.documentation, "counter")
+        with self._lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(zip(self.labelnames, key))} {value}")
+        return lines
+
+
+class Histogram:
+    """按标签分组的直方图，每组使用一个 LatencyHistogram"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self.children.get(key)
+            if child is None:
+                child = self.children[key] = LatencyHistogram(self.buckets)
+        child.observe(seconds)
+
+    def collect(self):
+        lines = _header(self.name, self.documentation, "histogram")
+        with self._lock:
+            children = sorted(self.children.items())
+        for key, child in children:
+            lines.extend(histogram_lines(self.name, tuple(zip(self.labelnames, key)), child.snapshot()))
+        return lines
+
+
+class Registry:
+    """指标注册表
+
+    除计数器和直方图外，还可以注册采集函数：每次抓取时调用，
+    返回若干样本行（用于队列深度、工作线程占用等即时状态）。
+    """
+
+    def __init__(self):
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.register(metric.collect)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.register(metric.collect)
+        return metric
+
+    def register(self, collector):
+        with self._lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        """以 Prometheus 文本格式输出所有指标"""
+        with self._lock:
+            collectors = list(self.collectors)
+        lines = []
+        for collect in collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def error_class(error):
+    """错误分类：取异常链最内层的异常类名（执行器会把底层异常包装为通用 Exception）"""
+    while error.__cause__ is not None:
+        error = error.__cause__
+    return type(error).__name__
+
+
+def scheduler_collector(scheduler):
+    """队列深度与各阶段工作槽位占用"""
+    def collect():
+        stages = sorted(scheduler.stages.items())
+        lines = _header("math_to_manim_queue_depth", "排队等待的任务数", "gauge")
+        for name, stage in stages:
+            lines.append(f'math_to_manim_queue_depth{{stage="{name}"}} {stage.depth()}')
+        lines += _header("math_to_manim_workers_busy", "正在执行的任务数", "gauge")
+        for name, stage in stages:
+            lines.append(f'math_to_manim_workers_busy{{stage="{name}"}} {stage.active}')
+        lines += _header("math_to_manim_workers_total", "阶段并发上限", "gauge")
+        for name, stage in stages:
+            lines.append(f'math_to_manim_workers_total{{stage="{name}"}} {stage.concurrency}')
+        lines += _header("math_to_manim_worker_utilization", "工作槽位占用率（0-1）", "gauge")
+        for name, stage in stages:
+            lines.append(
+                f'math_to_manim_worker_utilization{{stage="{name}"}} '
+                f'{_format_value(stage.active / stage.concurrency)}'
+            )
+        return lines
+    return collect
+
+
+def router_collector(router):
+    """模型路由的单次调用延迟与结果（对冲请求分别统计）"""
+    def collect():
+        lines = _header("math_to_manim_llm_route_seconds", "单个路由的 LLM 调用耗时", "histogram")
+        for route, histogram in sorted(router.histograms.items()):
+            lines.extend(histogram_lines(
+                "math_to_manim_llm_route_seconds", (("route", route),), histogram.snapshot()
+            ))
+        lines += _header(
+            "math_to_manim_llm_route_censored_seconds", "落败后被取消的 LLM 调用在取消前已等待的时间", "histogram"
+        )
+        for route, histogram in sorted(router.censored.items()):
+            lines.extend(histogram_lines(
+                "math_to_manim_llm_route_censored_seconds", (("route", route),), histogram.snapshot()
+            ))
+        lines += _header("math_to_manim_llm_route_outcomes_total", "路由结果计数", "counter")
+        with router._lock:
+            outcomes = {route: dict(counts) for route, counts in router.outcomes.items()}
+        for route, counts in sorted(outcomes.items()):
+            for outcome, count in sorted(counts.items()):
+                lines.append(
+                    f'math_to_manim_llm_route_outcomes_total{{route="{route}",outcome="{outcome}"}} {count}'
+                )
+        return lines
+    return collect
+
+
+def job_queue_collector(queue):
+    """多节点渲染队列中各状态的任务数"""
+    def collect():
+        counts = queue.counts()
+        lines = _header("math_to_manim_render_queue_jobs", "渲染队列中各状态的任务数", "gauge")
+        for status in ("queued", "running", "succeeded", "failed", "cancelled"):
+            lines.append(f'math_to_manim_render_queue_jobs{{status="{status}"}} {counts.get(status, 0)}')
+        return lines
+    return collect
+
+
+registry = Registry()
+
+# 各阶段耗时，由 telemetry.Trace 的 span 自动记录
+STAGE_SECONDS = registry.histogram(
+    "math_to_manim_stage_seconds", "流水线各阶段耗时（llm_done、render、encode 等）", ("stage",)
+)
+JOBS = registry.counter(
+    "math_to_manim_jobs_total", "完成的任务数，失败按错误类型分类", ("outcome", "error")
+)
+CACHE_REQUESTS = registry.counter(
+    "math_to_manim_cache_requests_total", "缓存命中与未命中次数（llm、render、partial_movie）",
+    ("cache", "result")
+)
+
+COALESCED = registry.counter(
+    "math_to_manim_coalesced_total", "合并到进行中任务的重复请求数", ("stage",)
+)
+
+
+def record_job(error=None):
+    """记录一次任务结果"""
+    if error is None:
+        JOBS.inc(outcome="success", error="")
+    else:
+        JOBS.inc(outcome="failure", error=error_class(error))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_coalesced(stage):
+    COALESCED.inc(stage=stage)
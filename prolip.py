@@ -1,12 +1,13 @@
 from manim import *
 from manim.mobject.geometry.tips import ArrowTriangleFilledTip
 from manim.mobject.types.vectorized_mobject import VGroup
-from manim.mobject.geometry.line import Line
 from manim.mobject.geometry.arc import Circle
 from manim.mobject.text.tex_mobject import Tex, MathTex
 from manim.mobject.geometry.line import DashedLine
 from manim.mobject.geometry.line import Arrow
 
+from batched_mobjects import DenseConnections
+
 # We can create DashedArrow as a combination of DashedLine and Arrow
 class DashedArrow(DashedLine):
     def __init__(self, start, end, color=WHITE, buff=0.2, **kwargs):
@@ -60,16 +61,11 @@ class NeuralNetworkMobject(VGroup):
         
     def _connect_layers(self):
         for i in range(len(self.layers)-1):
-            current_layer = self.layers[i]
-            next_layer = self.layers[i+1]
-            for n1 in current_layer:
-                for n2 in next_layer:
-                    edge = Line(
-                        n1.get_center(),
-                        n2.get_center(),
-                        stroke_opacity=0.5
-                    )
-                    self.edges.add(edge)
+            self.edges.add(DenseConnections(
+                [n1.get_center() for n1 in self.layers[i]],
+                [n2.get_center() for n2 in self.layers[i+1]],
+                stroke_opacity=0.5
+            ))
         self.add(self.edges)
         
     def _add_labels(self):
@@ -0,0 +1,214 @@
+import os
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被快速拒绝"""
+
+
+class RequestCancelled(Exception):
+    """请求在等待或执行过程中被取消"""
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate            # 每秒补充的令牌数
+        self.capacity = capacity    # 桶容量（允许的突发量）
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1, timeout=None, cancel_event=None):
+        """取出 amount 个令牌，必要时等待；超时返回 False"""
+        amount = min(amount, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                wait = (amount - self.tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(min(wait, 1.0))
+
+    def adjust(self, delta):
+        """按实际用量修正令牌（正数退还，负数追加扣除）"""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + delta)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开，冷却结束后放行一次探测请求"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """当前是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def is_open(self):
+        with self._lock:
+            return self.state != self.CLOSED
+
+    def release_probe(self):
+        """探测请求既未成功也未失败（如被取消）时释放探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+def is_retryable(error):
+    """限流、超时、连接错误和服务端错误可以重试"""
+    # 出错时客户端已经创建，openai 已加载；延迟导入以免拖慢 Web 进程启动
+    import openai
+
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError,
+                          openai.InternalServerError)):
+        return True
+    return getattr(error, "status_code", None) in (408, 409, 429, 500, 502, 503, 504)
+
+
+def retry_after(error):
+    """从错误响应中读取 Retry-After（秒），没有时返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """所有 LLM 调用共享的客户端限流器
+
+    同时限制每秒请求数和每分钟 token 数，失败时按指数退避加抖动重试，
+    遵循 Retry-After，并在 API 持续异常时打开熔断器快速失败。
+    """
+
+    def __init__(self, requests_per_second=None, tokens_per_minute=None,
+                 max_retries=None, base_delay=1.0, max_delay=60.0, breaker=None):
+        if requests_per_second is None:
+            requests_per_second = float(os.getenv("LLM_RPS", "2"))
+        if tokens_per_minute is None:
+            tokens_per_minute = float(os.getenv("LLM_TPM", "300000"))
+        if max_retries is None:
+            max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+        self.request_bucket = TokenBucket(requests_per_second, max(1.0, requests_per_second))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))
+        )
+
+    def backoff(self, attempt):
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, estimated_tokens=0, cancel_event=None):
+        """在限流保护下执行 fn
+
+        fn 返回 (结果, 实际 token 数)，实际 token 数未知时返回 None。
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("AI 服务暂时不可用，请稍后再试")
+
+            if not self.request_bucket.acquire(1, cancel_event=cancel_event) or \
+                    not self.token_bucket.acquire(estimated_tokens, cancel_event=cancel_event):
+                self.breaker.release_probe()
+                raise RequestCancelled("请求已取消")
+
+            try:
+                result, used_tokens = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    import openai
+
+                    # 服务端给出了明确响应（如参数错误），说明 API 本身可用
+                    if isinstance(e, openai.APIStatusError):
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.release_probe()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                attempt += 1
+                if cancel_event is not None:
+                    if cancel_event.wait(delay):
+                        raise RequestCancelled("请求已取消")
+                else:
+                    time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            if used_tokens is not None:
+                self.token_bucket.adjust(estimated_tokens - used_tokens)
+            return result
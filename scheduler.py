@@ -0,0 +1,146 @@
+import inspect
+import itertools
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# 排队期间 run_stage 产出的状态
+QueueStatus = namedtuple("QueueStatus", "position eta")
+
+
+class SessionLimitExceeded(Exception):
+    """同一会话未完成的任务数超过上限"""
+
+
+class StageLimiter:
+    """单个流水线阶段的并发限制
+
+    按到达顺序排队，记录阶段平均耗时，用于向排队用户展示位置和预计等待时间。
+    """
+
+    def __init__(self, name, concurrency, initial_duration):
+        self.name = name
+        self.concurrency = concurrency
+        self.avg_duration = initial_duration   # 指数滑动平均耗时（秒）
+        self.active = 0
+        self.waiting = []
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+
+    def enqueue(self):
+        with self._cond:
+            ticket = next(self._tickets)
+            self.waiting.append(ticket)
+            return ticket
+
+    def position(self, ticket):
+        """排在该任务前面的任务数（含正在执行的）"""
+        with self._cond:
+            if ticket not in self.waiting:
+                return 0
+            return self.waiting.index(ticket) + self.active
+
+    def eta(self, position):
+        """按平均耗时估算开始执行前的等待秒数"""
+        rounds = math.floor(position / self.concurrency)
+        return rounds * self.avg_duration
+
+    def try_acquire(self, ticket, timeout):
+        """轮到该任务且有空闲槽位时返回 True，否则最多等待 timeout 秒后返回 False"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self.waiting and self.waiting[0] == ticket and self.active < self.concurrency:
+                    self.waiting.pop(0)
+                    self.active += 1
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+    def cancel(self, ticket):
+        with self._cond:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, duration):
+        with self._cond:
+            self.active -= 1
+            self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+            self._cond.notify_all()
+
+    def depth(self):
+        with self._cond:
+            return len(self.waiting)
+
+
+class PipelineScheduler:
+    """LLM 与渲染两个阶段分别限流，并限制每个会话同时未完成的任务数"""
+
+    def __init__(self, llm_concurrency=None, render_concurrency=None, max_jobs_per_session=None):
+        if llm_concurrency is None:
+            llm_concurrency = int(os.getenv("LLM_CONCURRENCY", "4"))
+        if render_concurrency is None:
+            render_concurrency = int(os.getenv("RENDER_CONCURRENCY", "2"))
+        if max_jobs_per_session is None:
+            max_jobs_per_session = int(os.getenv("MAX_JOBS_PER_SESSION", "1"))
+
+        self.stages = {
+            "llm": StageLimiter("llm", llm_concurrency, initial_duration=60.0),
+            "render": StageLimiter("render", render_concurrency, initial_duration=120.0),
+        }
+        self.max_jobs_per_session = max_jobs_per_session
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def total_concurrency(self):
+        return sum(stage.concurrency for stage in self.stages.values())
+
+    @contextmanager
+    def session(self, session_id):
+        """登记一个会话任务，超过上限时抛出 SessionLimitExceeded"""
+        with self._lock:
+            if self.sessions.get(session_id, 0) >= self.max_jobs_per_session:
+                raise SessionLimitExceeded(
+                    f"您已有 {self.max_jobs_per_session} 个任务正在处理，请等待完成后再提交"
+                )
+            self.sessions[session_id] = self.sessions.get(session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.sessions[session_id] -= 1
+                if not self.sessions[session_id]:
+                    del self.sessions[session_id]
+
+    def run_stage(self, stage_name, fn, poll_interval=1.0):
+        """在阶段并发限制下执行 fn 的生成器
+
+        排队期间产出 QueueStatus(位置, 预计等待秒数)；若 fn 返回生成器，
+        其产出的进度事件会在占用槽位期间原样转发。执行结束后通过 StopIteration
+        返回结果，调用方可用 ``result = yield from scheduler.run_stage(...)`` 获取。
+        """
+        stage = self.stages[stage_name]
+        ticket = stage.enqueue()
+        try:
+            while not stage.try_acquire(ticket, poll_interval):
+                position = stage.position(ticket)
+                yield QueueStatus(position, stage.eta(position))
+        except BaseException:
+            stage.cancel(ticket)
+            raise
+
+        start = time.monotonic()
+        try:
+            result = fn()
+            if inspect.isgenerator(result):
+                result = yield from result
+            return result
+        finally:
+            stage.release(time.monotonic() - start)
@@ -0,0 +1,119 @@
+import inspect
+import threading
+
+# 领头的调用方中途离开，跟随者需要重新竞争执行
+_ABANDONED = object()
+
+
+class FlightRestarted:
+    """进度事件：领头者中途离开，本次调用改为加入或领头一次新的执行
+
+    之前转发的进度（排队位置、实时预览分片等）已作废，新执行的进度从头开始。
+    """
+
+    def __repr__(self):
+        return "FlightRestarted()"
+
+
+class _Flight:
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.abandoned = False
+        self.result = None
+        self.error = None
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """合并相同键的并发调用
+
+    第一个调用方（领头者）实际执行 fn，执行期间到达的相同键调用挂在同一次执行上，
+    依次收到它产出的全部进度事件以及最终结果（或同一个异常）。领头者中途离开
+    （如用户关闭页面导致生成器被关闭）时，跟随者中的一个会接替重新执行，
+    各跟随者先收到一个 FlightRestarted，再收到新执行的进度事件。
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self.flights)
+
+    def run(self, key, fn, on_join=None):
+        """执行或加入 key 对应的调用的生成器，用法与 PipelineScheduler.run_stage 相同
+
+        fn 返回生成器时其产出的事件会转发给所有调用方；on_join 在作为跟随者加入时调用。
+        """
+        while True:
+            with self._lock:
+                flight = self.flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.flights[key] = _Flight()
+            if leader:
+                return (yield from self._lead(key, flight, fn))
+            if on_join is not None:
+                on_join()
+            outcome = yield from self._follow(flight)
+            if outcome is not _ABANDONED:
+                return outcome
+            yield FlightRestarted()
+
+    def _finish(self, key, flight, result=None, error=None, abandoned=False):
+        with self._lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        with flight.cond:
+            flight.result = result
+            flight.error = error
+            flight.abandoned = abandoned
+            flight.done = True
+            flight.cond.notify_all()
+
+    def _lead(self, key, flight, fn):
+        runner = None
+        try:
+            result = fn()
+            if inspect.isgenerator(result):
+                runner = result
+                try:
+                    while True:
+                        event = next(runner)
+                        with flight.cond:
+                            flight.events.append(event)
+                            flight.cond.notify_all()
+                        yield event
+                except StopIteration as stop:
+                    result = stop.value
+        except Exception as e:
+            self._finish(key, flight, error=e)
+            raise
+        except BaseException:
+            if runner is not None:
+                runner.close()
+            self._finish(key, flight, abandoned=True)
+            raise
+        self._finish(key, flight, result=result)
+        return result
+
+    def _follow(self, flight):
+        seen = 0
+        while True:
+            with flight.cond:
+                while len(flight.events) == seen and not flight.done:
+                    flight.cond.wait()
+                events = flight.events[seen:]
+                seen = len(flight.events)
+                done = flight.done
+            for event in events:
+                yield event
+            if done:
+                break
+        if flight.abandoned:
+            return _ABANDONED
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
@@ -0,0 +1,125 @@
+import math
+import os
+import re
+import shutil
+import subprocess
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from video import probe_duration
+
+# 渲染过程中每生成一个新分片产出一次
+LiveSegment = namedtuple("LiveSegment", "playlist index duration")
+
+PARTIAL_WRITTEN = re.compile(r"Animation (\d+) : Partial movie file written in '([^']+)'")
+PARTIAL_CACHED = re.compile(r"Animation (\d+) : Using cached data \(hash : (\w+)\)")
+
+
+class LiveSegmenter:
+    """边渲染边推流
+
+    解析 Manim 的日志输出，每当一个 play 调用对应的分段视频完成（或命中缓存），
+    就按动画顺序把它转封装为 HLS 分片并追加到 EVENT 类型的播放列表中，
+    浏览器可以在后续动画仍在渲染时先播放已完成的部分。
+    """
+
+    def __init__(self, live_dir, partial_root, scene_name, target_duration=10):
+        self.live_dir = Path(live_dir)
+        self.live_dir.mkdir(parents=True, exist_ok=True)
+        self.playlist = self.live_dir / "index.m3u8"
+        self.partial_root = Path(partial_root)     # media/videos/<模块名>
+        self.scene_name = scene_name
+        self.target_duration = target_duration
+        self.pending = {}        # 动画序号 -> 分段视频路径
+        self.next_index = 0
+        self.offset = 0.0        # 已推送分片的累计时长，作为下一个分片的时间戳偏移
+        self.segments = []       # [(文件名, 时长)]
+        self.finished = False
+
+    def _find_cached(self, hash_value):
+        matches = list(self.partial_root.glob(f"*/partial_movie_files/{self.scene_name}/{hash_value}.*"))
+        return matches[0] if matches else None
+
+    def feed(self, line):
+        """处理一行 Manim 输出，返回新生成的分片列表"""
+        match = PARTIAL_WRITTEN.search(line)
+        if match:
+            self.pending[int(match.group(1))] = Path(match.group(2))
+        else:
+            match = PARTIAL_CACHED.search(line)
+            if not match:
+                return []
+            self.pending[int(match.group(1))] = self._find_cached(match.group(2))
+        return self._flush(in_order=True)
+
+    def finish(self):
+        """渲染结束：推送剩余分段并写入 ENDLIST"""
+        segments = self._flush(in_order=False)
+        self.finished = True
+        self._write_playlist()
+        return segments
+
+    def _flush(self, in_order):
+        new_segments = []
+        while self.pending:
+            if in_order and self.next_index not in self.pending:
+                break
+            index = self.next_index if in_order else min(self.pending)
+            partial = self.pending.pop(index)
+            self.next_index = index + 1
+            if partial is None or not partial.exists():
+                continue
+            segment = self._convert(partial)
+            if segment is not None:
+                new_segments.append(segment)
+        if new_segments:
+            self._write_playlist()
+        return new_segments
+
+    def _convert(self, partial):
+        """把分段视频转封装为 MPEG-TS 分片，时间戳接在上一个分片之后"""
+        duration = probe_duration(partial)
+        if not duration:
+            return None
+        name = f"segment_{len(self.segments):04d}.ts"
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", str(partial),
+             "-c", "copy", "-bsf:v", "h264_mp4toannexb",
+             "-output_ts_offset", f"{self.offset:.6f}",
+             "-f", "mpegts", str(self.live_dir / name)],
+            check=True,
+            capture_output=True
+        )
+        self.segments.append((name, duration))
+        self.offset += duration
+        return LiveSegment(self.playlist, len(self.segments) - 1, duration)
+
+    def _write_playlist(self):
+        target = max([self.target_duration] + [math.ceil(d) for _, d in self.segments])
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{target}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for name, duration in self.segments:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(name)
+        if self.finished:
+            lines.append("#EXT-X-ENDLIST")
+        tmp = self.playlist.with_suffix(".m3u8.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, self.playlist)
+
+
+def cleanup_live_dirs(root, max_age=3600):
+    """删除超过 max_age 秒的实时预览目录"""
+    root = Path(root)
+    if not root.exists():
+        return
+    now = time.time()
+    for path in root.iterdir():
+        if path.is_dir() and now - path.stat().st_mtime > max_age:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,74 @@
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger("math_to_manim")
+
+
+def configure_logging():
+    """按 LOG_LEVEL 环境变量配置日志（已配置过时不重复配置）"""
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+
+
+def _format_fields(fields):
+    return "".join(f" {key}={value}" for key, value in fields.items())
+
+
+class Trace:
+    """一次请求的分阶段计时
+
+    每个阶段结束时输出一行结构化日志（job、stage、duration_ms 及附加字段）；
+    设置 DEBUG_PAYLOAD_DIR 后，提示词、AI 响应、代码和 Manim 输出等大段内容
+    写入 <目录>/<job_id>/ 下的文件，而不是打印到标准输出。
+    """
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.started = time.monotonic()
+        self.spans = {}
+        payload_dir = os.getenv("DEBUG_PAYLOAD_DIR")
+        self.payload_dir = Path(payload_dir) / self.job_id if payload_dir else None
+
+    def _record(self, stage, duration, status, fields):
+        self.spans[stage] = duration
+        if status == "ok":
+            STAGE_SECONDS.observe(duration, stage=stage)
+        logger.info(
+            "span job=%s stage=%s status=%s duration_ms=%.1f%s",
+            self.job_id, stage, status, duration * 1000, _format_fields(fields)
+        )
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """记录一个阶段的耗时，with 块内可向 fields 追加字段"""
+        start = time.monotonic()
+        try:
+            yield fields
+        except BaseException:
+            self._record(stage, time.monotonic() - start, "error", fields)
+            raise
+        self._record(stage, time.monotonic() - start, "ok", fields)
+
+    def mark(self, stage, **fields):
+        """记录从请求开始到某个时间点的耗时（如 LLM 首个 token）"""
+        self._record(stage, time.monotonic() - self.started, "ok", fields)
+
+    def event(self, message, level=logging.INFO, **fields):
+        """输出一条带 job 的结构化事件日志"""
+        logger.log(level, "event job=%s msg=%s%s", self.job_id, message, _format_fields(fields))
+
+    def dump(self, name, content):
+        """把大段内容写入调试文件；未启用时什么也不做"""
+        if self.payload_dir is None:
+            return
+        self.payload_dir.mkdir(parents=True, exist_ok=True)
+        (self.payload_dir / name).write_text(content, encoding="utf-8")
+        logger.debug("payload job=%s file=%s", self.job_id, self.payload_dir / name)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import re
+from collections import namedtuple
+
+from cache import normalize_concept
+
+# 模板匹配结果：模板名、置信度（0-1）和从描述中提取的参数
+TemplateMatch = namedtuple("TemplateMatch", "template confidence params")
+
+
+# 模板网络的规模上限：层数和每层神经元数过大时动画无法看清，渲染也会非常慢
+MAX_LAYERS = 8
+MAX_LAYER_SIZE = 16
+
+
+def _network_params(text):
+    params = {}
+    sizes = re.search(r"(\d+(?:\s*[-x×,]\s*\d+)+)", text)
+    if sizes:
+        params["layer_sizes"] = [
+            max(1, min(int(n), MAX_LAYER_SIZE)) for n in re.findall(r"\d+", sizes.group(1))[:MAX_LAYERS]
+        ]
+    else:
+        layers = re.search(r"(\d+)\s*(?:layers?|层)", text)
+        if layers:
+            count = max(2, min(int(layers.group(1)), MAX_LAYERS))
+            params["layer_sizes"] = [3] + [4] * (count - 2) + [3]
+    return params
+
+
+def _training_params(text):
+    epochs = re.search(r"(\d+)\s*(?:epochs?|轮|个\s*epoch)", text)
+    return {"epochs": max(1, min(int(epochs.group(1)), 50))} if epochs else {}
+
+
+def _comparison_params(text):
+    params = {}
+    names = re.findall(r"model\s+([a-z0-9]+)|模型\s*([a-z0-9]+)", text)
+    for i, (english, chinese) in enumerate(names[:2], start=1):
+        params[f"title{i}"] = f"Model {(english or chinese).upper()}"
+    values = re.findall(r"(\d+(?:\.\d+)?)\s*%", text)
+    for i, value in enumerate(values[:2], start=1):
+        params[f"value{i}"] = min(float(value), 100.0) / 100
+    return params
+
+
+# 参数部分（层数、轮数、百分比等）视为已被模板理解的内容
+PARAM_PATTERN = re.compile(
+    r"\d+(?:\s*[-x×,]\s*\d+)+|\d+\s*(?:layers?|层|epochs?|轮|个\s*epoch)|\d+(?:\.\d+)?\s*%"
+    r"|model\s+[a-z0-9]+|模型\s*[a-z0-9]+"
+)
+
+# 描述中不影响含义的常见词
+FILLER_PATTERN = re.compile(
+    r"\b(?:show|me|visuali[sz]e|animate|animation|draw|please|a|an|the|of|with|and|how|"
+    r"over|for|in|on|to|accuracy)\b|展示|演示|可视化|动画|一个|的|请|和|与|画|显示"
+)
+
+# 模板注册表：关键词 -> 权重（1.0 表示单独出现即可确定模板）
+TEMPLATE_KEYWORDS = {
+    "network": {
+        "neural network": 1.0, "神经网络": 1.0, "perceptron": 1.0, "感知机": 1.0,
+        "mlp": 1.0, "多层感知机": 1.0, "network": 0.5, "网络": 0.5, "neurons": 0.5, "神经元": 0.5,
+        "layers": 0.3, "层": 0.3,
+    },
+    "training": {
+        "training progress": 1.0, "训练过程": 1.0, "训练进度": 1.0, "training": 0.7, "训练": 0.7,
+        "epochs": 0.5, "epoch": 0.5,
+    },
+    "comparison": {
+        "compare": 0.7, "comparison": 0.7, "versus": 0.7, "vs": 0.7, "对比": 0.7, "比较": 0.7,
+        "model": 0.3, "模型": 0.3,
+    },
+    "optimal_transport": {
+        "optimal transport": 1.0, "最优传输": 1.0, "transport map": 1.0, "传输映射": 1.0,
+        "monge": 0.7, "wasserstein": 0.7,
+        "transform": 0.4, "transformation": 0.4, "map": 0.4, "mapping": 0.4, "gradient": 0.3,
+    },
+    "particle_system": {
+        "particle system": 1.0, "粒子系统": 1.0, "particles": 0.7, "particle": 0.7, "粒子": 0.7,
+        "interpolation": 0.5, "插值": 0.5, "α": 0.5,
+    },
+    "vector_field": {
+        "vector field": 1.0, "向量场": 1.0, "矢量场": 1.0, "velocity field": 1.0, "速度场": 1.0,
+        "streamlines": 0.7, "流线": 0.7, "ν": 0.5,
+    },
+}
+
+TEMPLATE_PARAMS = {
+    "network": _network_params,
+    "training": _training_params,
+    "comparison": _comparison_params,
+}
+
+
+def _residual_length(text, spans):
+    """去掉已匹配部分、常见词、参数和标点后剩余的字符数"""
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = [" "] * (end - start)
+    rest = "".join(chars)
+    rest = PARAM_PATTERN.sub(" ", rest)
+    rest = FILLER_PATTERN.sub(" ", rest)
+    return len(re.sub(r"[\W_]+", "", rest))
+
+
+class TemplateIndex:
+    """把所有模板的关键词编译为一个正则，一次扫描描述即可为全部模板打分
+
+    同一关键词可属于多个模板；交替分支按长度从长到短排列，同一位置总是匹配最长的
+    关键词，“网络”不会重复计入“神经网络”。
+    """
+
+    def __init__(self, keywords, params=None):
+        self.params = params or {}
+        self.order = {name: i for i, name in enumerate(keywords)}
+        # 关键词 -> [(模板名, 权重)]
+        self.index = {}
+        for name, table in keywords.items():
+            for keyword, weight in table.items():
+                self.index.setdefault(normalize_concept(keyword), []).append((name, weight))
+        alternatives = [
+            rf"\b{re.escape(keyword)}\b" if keyword.isascii() else re.escape(keyword)
+            for keyword in sorted(self.index, key=len, reverse=True)
+        ]
+        self.pattern = re.compile("|".join(alternatives))
+
+    def rank(self, text):
+        """按置信度从高到低返回所有命中模板的 TemplateMatch 列表，没有命中时为空
+
+        置信度 = 关键词得分（上限 1）× 覆盖率。覆盖率是关键词占描述有效内容的比例，
+        描述中还有模板无法表达的内容时（如“神经网络的反向传播”）置信度会明显降低。
+        """
+        text = normalize_concept(text)
+        hits = {}  # 模板名 -> (得分, 命中区间)
+        for match in self.pattern.finditer(text):
+            for name, weight in self.index[match.group()]:
+                score, spans = hits.get(name, (0.0, []))
+                spans.append(match.span())
+                hits[name] = (score + weight, spans)
+
+        scored = []
+        for name, (score, spans) in hits.items():
+            covered = sum(end - start for start, end in spans)
+            coverage = covered / (covered + _residual_length(text, spans))
+            scored.append((min(score, 1.0) * coverage, score, name))
+        # 置信度相同时得分高的优先，再相同时按注册顺序
+        scored.sort(key=lambda item: (-item[0], -item[1], self.order[item[2]]))
+        return [
+            TemplateMatch(name, round(confidence, 3), self.params.get(name, lambda _: {})(text))
+            for confidence, _, name in scored
+        ]
+
+
+TEMPLATE_INDEX = TemplateIndex(TEMPLATE_KEYWORDS, TEMPLATE_PARAMS)
+
+
+def rank(text):
+    """为描述给所有模板打分，返回按置信度排序的 TemplateMatch 列表"""
+    return TEMPLATE_INDEX.rank(text)
+
+
+def classify(text):
+    """把描述匹配到最合适的模板，没有任何关键词命中时返回 None"""
+    ranked = rank(text)
+    return ranked[0] if ranked else None
+
+
+def canonical_params(params):
+    """参数规范化：键排序、转为 JSON 基本类型（元组变列表），与传入顺序无关"""
+    return json.loads(json.dumps(params or {}, sort_keys=True, default=str))
+
+
+def template_cache_key(template, params):
+    """模板场景的稳定键：模板名 + 规范化参数的哈希"""
+    payload = json.dumps(canonical_params(params), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{template}\n{payload}".encode("utf-8")).hexdigest()
+    return f"{template}-{digest[:16]}"
+
+
+def template_code(match):
+    """生成渲染模板的场景文件，由 ManimExecutor 像普通代码一样渲染
+
+    参数按规范化后的顺序写入，相同模板和参数生成完全相同的代码，从而命中渲染缓存。
+    """
+    scene_name = "".join(part.title() for part in match.template.split("_")) + "TemplateScene"
+    params = canonical_params(match.params)
+    return (
+        "from manim import *\n"
+        "from text_to_manim import MLAnimationGenerator\n"
+        "\n"
+        f"# template: {template_cache_key(match.template, params)}\n"
+        f"TemplateScene = MLAnimationGenerator().build_scene({match.template!r}, {params!r})\n"
+        "\n"
+        "\n"
+        f"class {scene_name}(TemplateScene):\n"
+        "    pass\n"
+    )
@@ -0,0 +1,46 @@
+import threading
+
+from singleflight import FlightRestarted, SingleFlight
+
+
+def test_follower_restarts_when_leader_abandons():
+    flights = SingleFlight()
+    joined = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(len(calls))
+        attempt = calls[-1]
+        yield ("progress", attempt)
+        return f"result-{attempt}"
+
+    leader = flights.run("key", work)
+    assert next(leader) == ("progress", 0)
+
+    follower_events = []
+    follower_result = []
+
+    def follow():
+        runner = flights.run("key", work, on_join=joined.set)
+        try:
+            while True:
+                follower_events.append(next(runner))
+        except StopIteration as stop:
+            follower_result.append(stop.value)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    assert joined.wait(5)
+
+    # 领头者离开（如用户关闭页面），跟随者接替重新执行
+    leader.close()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    # 旧执行的进度之后是重置事件，新执行的进度不会与旧的混在一起
+    first, restarted, second = follower_events
+    assert first == ("progress", 0)
+    assert isinstance(restarted, FlightRestarted)
+    assert second == ("progress", 1)
+    assert follower_result == ["result-1"]
+    assert flights.in_flight() == 0
@@ -1,7 +1,14 @@
 import re
+import threading
 from manim import *  # This imports all Manim objects including Text, Circle, etc.
+from batched_mobjects import DenseConnections, Deform
+from template_registry import canonical_params, rank, template_cache_key
 
 class MLAnimationGenerator:
+    # Generated scene classes, shared by all generator instances: (template, key) -> class
+    _scene_classes = {}
+    _scene_lock = threading.Lock()
+
     def __init__(self):
         self.templates = {
             'network': self._create_network_template,
@@ -19,6 +26,8 @@ class MLAnimationGenerator:
                 # Parse parameters
                 layer_sizes = params.get('layer_sizes', [3, 4, 3])
                 title_text = params.get('title', 'Neural Network')
+                # Optional per layer pair weight matrices (len(layer) x len(next_layer))
+                weights = params.get('weights') or [None] * (len(layer_sizes) - 1)
                 
                 # Create title
                 title = Text(title_text).scale(0.8)
@@ -35,15 +44,15 @@ class MLAnimationGenerator:
                 network = VGroup(*layers).arrange(RIGHT, buff=2)
                 network.move_to(ORIGIN)
                 
-                # Create connections
+                # Create connections, one batched mobject per layer pair
                 connections = VGroup()
                 for i in range(len(layers)-1):
-                    curr_layer = layers[i]
-                    next_layer = layers[i+1]
-                    for n1 in curr_layer:
-                        for n2 in next_layer:
-                            line = Line(n1.get_right(), n2.get_left(), stroke_width=1)
-                            connections.add(line)
+                    connections.add(DenseConnections(
+                        [n1.get_right() for n1 in layers[i]],
+                        [n2.get_left() for n2 in layers[i+1]],
+                        weights=weights[i],
+                        stroke_width=1
+                    ))
                 
                 # Animations
                 self.play(Write(title))
@@ -204,50 +213,65 @@ class MLAnimationGenerator:
                     }
                 )
                 
-                # Create transformation
-                def transport_function(point):
-                    x, y, z = point
-                    return np.array([
+                # Create transformation (vectorized over all grid points)
+                def transport_function(points):
+                    x, y = points[:, 0], points[:, 1]
+                    return np.column_stack([
                         x * np.cos(y),
                         y * np.sin(x),
-                        0
+                        np.zeros(len(points))
                     ])
                 
                 # Animate grid transformation
                 self.play(Create(grid))
                 self.play(
-                    grid.animate.apply_function(transport_function),
+                    Deform(grid, transport_function),
                     run_time=3
                 )
                 self.wait()
         
         return OptimalTransportScene
 
+    def rank_templates(self, text):
+        """All templates whose keywords occur in the text, best match first (see template_registry.rank)"""
+        return [match for match in rank(text) if match.template in self.templates]
+
     def parse_description(self, text):
         """Parse natural language description into scene parameters"""
-        params = {}
-        
-        # Detect mathematical content
-        if any(term in text.lower() for term in ['α', 'ν', 'gradient', 'vector field', 'particle']):
-            if 'particle' in text.lower() or 'α' in text:
-                params['template'] = 'particle_system'
-            elif 'vector field' in text.lower() or 'ν' in text:
-                params['template'] = 'vector_field'
-            elif 'transform' in text.lower() or 'map' in text.lower():
-                params['template'] = 'optimal_transport'
-        
-        return params
+        ranked = self.rank_templates(text)
+        if not ranked:
+            return {}
+        best = ranked[0]
+        return dict(best.params, template=best.template)
+
+    def scene_cache_key(self, template_name, params):
+        """Stable key for a template scene: template name plus a hash of the canonicalized params"""
+        return template_cache_key(template_name, params)
+
+    def build_scene(self, template_name, params=None):
+        """Return the scene class for a template, reusing the class built for identical params
+
+        The class carries its key as ``cache_key`` so callers can use it for render-level caching.
+        """
+        params = canonical_params(params)  # private copy: the closures must not see later edits
+        key = self.scene_cache_key(template_name, params)
+        with self._scene_lock:
+            scene_class = self._scene_classes.get(key)
+            if scene_class is None:
+                scene_class = self.templates[template_name](params)
+                scene_class.cache_key = key
+                self._scene_classes[key] = scene_class
+        return scene_class
 
     def generate_scene(self, description):
         """Generate a manim scene based on the description"""
         params = self.parse_description(description)
         template_name = params.pop('template', 'particle_system')  # Default to particle system
         
-        if template_name in self.templates:
-            return self.templates[template_name](params)
-        else:
+        if template_name not in self.templates:
             # Fallback to particle system if no specific template matches
-            return self.templates['particle_system'](params)
+            template_name = 'particle_system'
+        return self.build_scene(template_name, params)
 
 # The simple create_animation function remains as a fallback
 def create_animation(description):
@@ -0,0 +1,231 @@
+import html
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+    ".ts": "video/mp2t",
+    ".m3u8": "application/vnd.apple.mpegurl",
+}
+
+# 输出文件名包含内容哈希，可以长期缓存
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 播放列表和直播目录中的文件仍在变化，每次都需要向服务器确认
+NO_CACHE = "no-cache"
+IMMUTABLE_SUFFIXES = {".mp4", ".ts"}
+LIVE_DIR_NAME = "live"
+
+
+def faststart(video_path):
+    """将 moov atom 移到文件开头，使浏览器无需下载完整文件即可开始播放"""
+    video_path = Path(video_path)
+    tmp = video_path.with_name(f".{video_path.stem}.faststart.mp4")
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", str(video_path),
+         "-c", "copy", "-movflags", "+faststart", str(tmp)],
+        check=True,
+        capture_output=True
+    )
+    os.replace(tmp, video_path)
+    return video_path
+
+
+def probe_duration(video_path):
+    """用 ffprobe 读取视频时长（秒），失败时返回 None"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def hls_playlist_path(video_path):
+    """视频对应的 HLS 播放列表路径（<文件名>_hls/index.m3u8）"""
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}_hls") / "index.m3u8"
+
+
+def segment_hls(video_path, segment_seconds=6):
+    """把视频切分为 HLS 分片（不重新编码），返回播放列表路径"""
+    playlist = hls_playlist_path(video_path)
+    hls_dir = playlist.parent
+    tmp_dir = hls_dir.with_name(f".{hls_dir.name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", str(video_path),
+         "-c", "copy", "-f", "hls",
+         "-hls_time", str(segment_seconds),
+         "-hls_playlist_type", "vod",
+         "-hls_segment_filename", str(tmp_dir / "segment_%04d.ts"),
+         str(tmp_dir / playlist.name)],
+        check=True,
+        capture_output=True
+    )
+    shutil.rmtree(hls_dir, ignore_errors=True)
+    os.replace(tmp_dir, hls_dir)
+    return playlist
+
+
+def ensure_hls(video_path, min_duration=None):
+    """时长超过阈值的视频生成 HLS 分片，已存在时直接返回；短视频返回 None"""
+    if min_duration is None:
+        min_duration = float(os.getenv("HLS_MIN_DURATION", "120"))
+    if min_duration < 0:
+        return None
+    playlist = hls_playlist_path(video_path)
+    if playlist.exists():
+        return playlist
+    duration = probe_duration(video_path)
+    if duration is None or duration < min_duration:
+        return None
+    return segment_hls(video_path)
+
+
+def _parse_range(range_header, size):
+    """解析单段 Range 请求头，返回 (start, end)；无法满足时返回 None"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1) == "":
+        # bytes=-N 表示最后 N 个字节
+        start = max(0, size - int(match.group(2)))
+        end = size - 1
+    else:
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+        end = min(end, size - 1)
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def cache_control(path):
+    """选择缓存策略：只有已完成、文件名带内容哈希的 .mp4/.ts 才能标记为 immutable
+
+    直播目录（live/）中的内容和 .m3u8 播放列表在渲染过程中不断更新，必须 no-cache。
+    """
+    path = Path(path)
+    if path.suffix == ".m3u8" or LIVE_DIR_NAME in path.parts:
+        return NO_CACHE
+    if path.suffix in IMMUTABLE_SUFFIXES:
+        return CACHE_CONTROL
+    return NO_CACHE
+
+
+def media_response(path, range_header=None, chunk_size=1024 * 1024):
+    """返回支持 Range 请求的媒体文件响应，缓存策略见 cache_control"""
+    path = Path(path)
+    stat = path.stat()
+    media_type = MEDIA_TYPES.get(path.suffix, "application/octet-stream")
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control(path),
+        "ETag": f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+    }
+    if not range_header:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    byte_range = _parse_range(range_header, stat.st_size)
+    if byte_range is None:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.st_size}"})
+    start, end = byte_range
+
+    def iter_file():
+        remaining = end - start + 1
+        with open(path, "rb") as f:
+            f.seek(start)
+            while remaining > 0:
+                data = f.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat.st_size}",
+        "Content-Length": str(end - start + 1),
+    })
+    return StreamingResponse(iter_file(), status_code=206, media_type=media_type, headers=headers)
+
+
+MEDIA_PREFIX = "/media/"
+
+
+def media_router(root):
+    """/media/{path} 路由：提供 root 目录中的视频和 HLS 文件（经 media_response，支持 Range 与缓存头）"""
+    from fastapi import APIRouter, HTTPException, Request
+
+    root = Path(root).resolve()
+    router = APIRouter()
+
+    @router.get(MEDIA_PREFIX + "{file_path:path}")
+    async def media(file_path: str, request: Request):
+        """提供输出目录中的视频和 HLS 分片（支持 Range 请求；直播播放列表不缓存）"""
+        path = (root / file_path).resolve()
+        if not path.is_relative_to(root) or not path.is_file():
+            raise HTTPException(status_code=404, detail="文件不存在")
+        return media_response(path, request.headers.get("range"))
+
+    return router
+
+
+# Chrome/Firefox 桌面版不能原生播放 HLS：页面加载 hls.js，为只有 HLS 源的播放器（实时预览）挂载 MSE 播放；
+# 既不支持原生 HLS 也不支持 MSE 时隐藏播放器，只保留进度文字
+HLS_JS_URL = os.getenv("HLS_JS_URL", "https://cdn.jsdelivr.net/npm/hls.js@1.5.15/dist/hls.min.js")
+HLS_PLAYER_HEAD = f"""
+<script src="{html.escape(HLS_JS_URL)}"></script>
+<script>
+(() => {{
+  const attach = (video) => {{
+    if (video.dataset.hlsAttached) return;
+    video.dataset.hlsAttached = "1";
+    if (video.querySelector('source[type="video/mp4"]')) return;
+    if (video.canPlayType("application/vnd.apple.mpegurl")) return;
+    if (window.Hls && window.Hls.isSupported()) {{
+      const hls = new window.Hls({{ liveDurationInfinity: true }});
+      hls.loadSource(video.dataset.hls);
+      hls.attachMedia(video);
+    }} else {{
+      video.style.display = "none";
+    }}
+  }};
+  const scan = () => document.querySelectorAll("video[data-hls]").forEach(attach);
+  new MutationObserver(scan).observe(document.documentElement, {{ childList: true, subtree: true }});
+  document.addEventListener("DOMContentLoaded", scan);
+}})();
+</script>
+"""
+
+
+def video_html(video_url=None, hls_url=None, caption=None):
+    """生成聊天中展示的视频播放器：支持 HLS 的浏览器优先播放分片，其余回退到 MP4
+
+    没有 MP4 源时（实时预览）由 HLS_PLAYER_HEAD 中的脚本通过 hls.js 播放 data-hls 指向的播放列表。
+    """
+    sources = ""
+    attrs = ""
+    if hls_url:
+        sources += f'<source src="{html.escape(hls_url)}" type="application/vnd.apple.mpegurl">'
+        attrs = f' data-hls="{html.escape(hls_url)}"'
+    if video_url:
+        sources += f'<source src="{html.escape(video_url)}" type="video/mp4">'
+    caption_html = ""
+    if caption:
+        caption_html = f'<div style="white-space: pre-wrap">{html.escape(caption)}</div>'
+    return (
+        f'{caption_html}'
+        f'<video controls playsinline preload="metadata" style="width: 100%"{attrs}>{sources}</video>'
+    )
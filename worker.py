@@ -0,0 +1,202 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from executor import KnownFailure, ManimExecutor, is_code_failure
+from job_queue import CODE_FAILURE, ENVIRONMENT_FAILURE, SQLiteJobQueue
+from streaming import LiveSegment
+from telemetry import Trace, configure_logging, logger
+
+
+class RemoteExecutor(ManimExecutor):
+    """与 ManimExecutor 接口相同，但把渲染任务交给队列另一端的 worker
+
+    轮询任务状态，worker 上报的实时预览分片以 LiveSegment 转发，
+    完成后返回共享存储上的视频路径。入队后 start_timeout 秒内没有 worker 领取、
+    或总耗时超过 timeout 秒时请求失败；请求失败或被中途放弃时取消队列中的任务。
+    """
+
+    def __init__(self, queue, poll_interval=1.0, start_timeout=None, timeout=None):
+        super().__init__()
+        self.queue = queue
+        self.poll_interval = poll_interval
+        if start_timeout is None:
+            start_timeout = float(os.getenv("RENDER_QUEUE_START_TIMEOUT", "600"))
+        if timeout is None:
+            timeout = float(os.getenv("RENDER_QUEUE_TIMEOUT", "1800"))
+        self.start_timeout = start_timeout
+        self.timeout = timeout
+
+    def execute_iter(self, code, trace=None):
+        trace = trace or Trace()
+        job_id = self.queue.enqueue({
+            "code": code,
+            "render_config": self.render_config,
+            "trace_id": trace.job_id,
+        })
+        trace.event("render_enqueued", queue_job=job_id)
+        enqueued = time.monotonic()
+        started = finished = False
+        next_index = 0
+        try:
+            with trace.span("render_remote", queue_job=job_id) as fields:
+                while True:
+                    state = self.queue.get(job_id)
+                    if state is None:
+                        raise Exception(f"渲染任务不存在: {job_id}")
+                    progress = state["progress"]
+                    if progress and progress["index"] >= next_index:
+                        next_index = progress["index"] + 1
+                        yield LiveSegment(
+                            self.output_dir / progress["playlist"], progress["index"], progress["duration"]
+                        )
+                    status = state["status"]
+                    if status in ("succeeded", "failed", "cancelled"):
+                        finished = True
+                        fields["attempts"] = state["attempts"]
+                    if status == "succeeded":
+                        return str(self.output_dir / state["result"]["video"])
+                    if status == "failed" and state["error_kind"] == CODE_FAILURE:
+                        # 保留失败类型，调用方据此清除 LLM 缓存中无法渲染的代码
+                        raise KnownFailure(state["error"])
+                    if status in ("failed", "cancelled"):
+                        raise Exception(state["error"])
+
+                    started = started or status == "running"
+                    elapsed = time.monotonic() - enqueued
+                    if not started and elapsed > self.start_timeout:
+                        raise TimeoutError(f"渲染任务排队超过 {self.start_timeout:.0f} 秒仍未被 worker 领取")
+                    if elapsed > self.timeout:
+                        raise TimeoutError(f"渲染任务超过 {self.timeout:.0f} 秒仍未完成")
+                    time.sleep(self.poll_interval)
+        finally:
+            # 超时、出错或生成器被关闭（用户离开）时，不再需要的任务不应继续占用 worker
+            if not finished:
+                try:
+                    if self.queue.cancel(job_id, "提交方已放弃该渲染任务"):
+                        trace.event("render_cancelled", level=logging.WARNING, queue_job=job_id)
+                except Exception as e:
+                    logger.warning("取消渲染任务失败 queue_job=%s: %s", job_id, e)
+
+
+class RenderWorker:
+    """领取并执行渲染任务
+
+    执行期间后台线程按 heartbeat_interval 续租；进程崩溃或失联时心跳停止，
+    租约过期后任务会被其他 worker 重新领取。续租失败（任务已被取消或回收）时放弃渲染。
+    """
+
+    def __init__(self, queue, worker_id=None, poll_interval=2.0, heartbeat_interval=None,
+                 executor_factory=ManimExecutor):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        if heartbeat_interval is None:
+            heartbeat_interval = getattr(queue, "lease_seconds", 60) / 3
+        self.heartbeat_interval = heartbeat_interval
+        self.executor_factory = executor_factory
+
+    def _heartbeat(self, job_id, stop, lost):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                if not self.queue.heartbeat(job_id, self.worker_id):
+                    logger.warning("worker=%s job=%s 租约已失效，任务可能已被取消或重新分配", self.worker_id, job_id)
+                    lost.set()
+                    return
+            except Exception as e:
+                # 共享存储短暂不可用时继续尝试，租约尚未过期前仍可恢复
+                logger.warning("worker=%s job=%s 心跳失败: %s", self.worker_id, job_id, e)
+
+    def run_once(self):
+        """领取并执行一个任务，队列为空时返回 False"""
+        job = self.queue.claim(self.worker_id)
+        if job is None:
+            return False
+
+        trace = Trace(job.payload.get("trace_id") or job.id)
+        trace.event("render_claimed", worker=self.worker_id, queue_job=job.id, attempt=job.attempts)
+        stop = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job.id, stop, lost), daemon=True)
+        heartbeat.start()
+        try:
+            executor = self.executor_factory()
+            executor.render_config.update(job.payload["render_config"])
+            runner = executor.execute_iter(job.payload["code"], trace)
+            try:
+                while True:
+                    update = next(runner)
+                    if isinstance(update, LiveSegment):
+                        if not self.queue.heartbeat(job.id, self.worker_id, progress={
+                            "playlist": Path(update.playlist).relative_to(executor.output_dir).as_posix(),
+                            "index": update.index,
+                            "duration": update.duration,
+                        }):
+                            lost.set()
+                    if lost.is_set():
+                        # 关闭生成器会终止 manim 子进程
+                        runner.close()
+                        trace.event("render_abandoned", level=logging.WARNING, queue_job=job.id)
+                        return True
+            except StopIteration as stop_iteration:
+                video_path = Path(stop_iteration.value)
+            result = {"video": video_path.relative_to(executor.output_dir).as_posix()}
+            if not self.queue.complete(job.id, self.worker_id, result):
+                trace.event("render_lease_lost", level=logging.WARNING, queue_job=job.id)
+        except Exception as e:
+            error_kind = CODE_FAILURE if is_code_failure(e) else ENVIRONMENT_FAILURE
+            if not self.queue.fail(job.id, self.worker_id, str(e), error_kind):
+                trace.event("render_lease_lost", level=logging.WARNING, queue_job=job.id)
+        finally:
+            stop.set()
+            heartbeat.join()
+        return True
+
+    def run(self, stop_event):
+        """循环领取任务，直到 stop_event 被设置（当前任务会执行完）"""
+        while not stop_event.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logger.error("worker=%s 领取任务失败: %s", self.worker_id, e)
+                claimed = False
+            if not claimed:
+                stop_event.wait(self.poll_interval)
+
+
+def main():
+    """在渲染节点上运行 worker
+
+    从共享存储上的 SQLite 队列（RENDER_QUEUE）领取任务，结果写入共享的 OUTPUT_DIR；
+    每个节点并发执行 WORKER_CONCURRENCY 个任务。
+    """
+    configure_logging()
+    if not os.getenv("RENDER_QUEUE"):
+        raise ValueError("RENDER_QUEUE environment variable is not set.")
+    queue = SQLiteJobQueue()
+    concurrency = int(os.getenv("WORKER_CONCURRENCY", "1"))
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    threads = [
+        threading.Thread(target=RenderWorker(queue).run, args=(stop_event,), name=f"render-worker-{i}")
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info("已启动 %d 个渲染 worker，队列: %s", concurrency, queue.path)
+    # 主线程等待信号；收到后各 worker 完成当前任务再退出
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1)
+
+
+if __name__ == "__main__":
+    main()